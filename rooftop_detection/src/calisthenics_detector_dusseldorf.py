@@ -42,11 +42,11 @@ class CalisthenicsDetectorDusseldorf:
         }
         
         # Known calisthenics parks for validation (corrected locations)
-        self.known_parks = [
+        self.known_parks = pd.DataFrame([
             {'name': 'Volksgarten Calisthenics Park', 'lat': 51.2186, 'lon': 6.7711, 'verified': True, 'description': 'Established calisthenics area in Volksgarten'},
             {'name': 'Florapark Calisthenics Area', 'lat': 51.2547, 'lon': 6.7858, 'verified': True, 'description': 'Outdoor fitness equipment in Florapark'}, 
             {'name': 'Düsseldorf Hauptbahnhof Area', 'lat': 51.2203, 'lon': 6.7947, 'verified': True, 'description': 'Calisthenics park near main train station'},
-        ]
+        ])
         
         # Calisthenics park detection parameters (updated with realistic sizes)
         self.detection_params = {
@@ -270,14 +270,14 @@ class CalisthenicsDetectorDusseldorf:
         }
         
         # Check each known park
-        for known_park in self.known_parks:
+        for known_park in self.known_parks.itertuples(index=False):
             closest_candidate = None
             min_distance = float('inf')
             
             # Find closest detection to known park
             for candidate in candidates:
-                lat_diff = candidate['center_latlon'][0] - known_park['lat']
-                lon_diff = candidate['center_latlon'][1] - known_park['lon']
+                lat_diff = candidate['center_latlon'][0] - known_park.lat
+                lon_diff = candidate['center_latlon'][1] - known_park.lon
                 distance = np.sqrt(lat_diff**2 + lon_diff**2) * 111000  # Rough conversion to meters
                 
                 if distance < min_distance:
@@ -288,7 +288,7 @@ class CalisthenicsDetectorDusseldorf:
             if min_distance < 500:
                 validation_results['true_positives'] += 1
                 validation_results['matches'].append({
-                    'known_park': known_park['name'],
+                    'known_park': known_park.name,
                     'detected_location': closest_candidate['center_latlon'],
                     'distance_m': min_distance,
                     'confidence': closest_candidate['confidence']
@@ -312,13 +312,13 @@ class CalisthenicsDetectorDusseldorf:
         m = folium.Map(location=[center_lat, center_lon], zoom_start=11)
         
         # Add known parks (ground truth)
-        for park in self.known_parks:
+        for park in self.known_parks.itertuples(index=False):
             folium.Marker(
-                location=[park['lat'], park['lon']],
+                location=[park.lat, park.lon],
                 popup=f"""
-                <b>{park['name']}</b><br>
-                Status: {"Verified" if park['verified'] else "To be verified"}<br>
-                Description: {park.get('description', 'Known calisthenics park')}<br>
+                <b>{park.name}</b><br>
+                Status: {"Verified" if park.verified else "To be verified"}<br>
+                Description: {park.description or 'Known calisthenics park'}<br>
                 Type: Ground truth location
                 """,
                 icon=folium.Icon(color='blue', icon='info-sign')
@@ -54,8 +54,8 @@ class CalisthenicsDetectorDusseldorf:
         # Filter for actual calisthenics-relevant stations
         self.calisthenics_stations = [
             station for station in self.real_fitness_stations 
-            if station.get('leisure') == 'fitness_station' and 
-               station.get('source') != 'fallback'
+            if station.leisure == 'fitness_station' and 
+               station.source != 'fallback'
         ]
         
         # Get park context
@@ -71,9 +71,9 @@ class CalisthenicsDetectorDusseldorf:
         if self.calisthenics_stations:
             print("\n🏋️ Real OSM Fitness Stations found:")
             for i, station in enumerate(self.calisthenics_stations[:5], 1):
-                print(f"{i}. OSM {station['osm_type']}/{station['osm_id']}")
-                print(f"   📍 {station['lat']:.4f}, {station['lon']:.4f}")
-                print(f"   🎯 Confidence: {station['confidence']:.2f}")
+                print(f"{i}. OSM {station.osm_type}/{station.osm_id}")
+                print(f"   📍 {station.lat:.4f}, {station.lon:.4f}")
+                print(f"   🎯 Confidence: {station.confidence:.2f}")
     
     def generate_mock_sentinel2_data(self, center_lat: float, center_lon: float, 
                                    size_km: float = 2.0) -> Dict:
@@ -89,8 +89,8 @@ class CalisthenicsDetectorDusseldorf:
         # Add equipment areas (low NDVI ~0.2) based on real OSM locations
         for station in self.calisthenics_stations:
             # Calculate relative position in the image
-            lat_diff = station['lat'] - center_lat
-            lon_diff = station['lon'] - center_lon
+            lat_diff = station.lat - center_lat
+            lon_diff = station.lon - center_lon
             
             # Convert to pixel coordinates (rough)
             pixel_x = int((lon_diff / (size_km * 0.009)) * pixels + pixels/2)
@@ -99,7 +99,7 @@ class CalisthenicsDetectorDusseldorf:
             # Check if station is within our image bounds
             if 0 <= pixel_x < pixels and 0 <= pixel_y < pixels:
                 # Create equipment signature
-                size = int(15 * station['confidence'])  # Size based on confidence
+                size = int(15 * station.confidence)  # Size based on confidence
                 y1, y2 = max(0, pixel_y-size), min(pixels, pixel_y+size)
                 x1, x2 = max(0, pixel_x-size), min(pixels, pixel_x+size)
                 
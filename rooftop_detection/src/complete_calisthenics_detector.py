@@ -8,13 +8,56 @@ Real implementation using:
 - Computer vision for detection
 """
 
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import orjson
 import requests
 import numpy as np
+import pandas as pd
 import cv2 as cv
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import folium
+from folium.plugins import FastMarkerCluster
 from dataclasses import dataclass
+from token_cache import EXPIRY_SLACK_S, TokenCache
+
+
+log = logging.getLogger(__name__)
+
+# Raw Sentinel-2 catalog search results, keyed by search payload; the date range
+# usually ends today, so entries expire to pick up new acquisitions
+CATALOG_CACHE_DIR = Path.home() / '.cache' / 'social-sports' / 'catalog'
+CATALOG_CACHE_TTL_S = 3600
+
+# Overpass query for fitness stations in Düsseldorf
+OSM_FITNESS_QUERY = """
+[out:json][timeout:25];
+(
+  area["name"="Düsseldorf"]["admin_level"="6"];
+)->.searchArea;
+(
+  node["leisure"="fitness_station"](area.searchArea);
+  way["leisure"="fitness_station"](area.searchArea);
+  node["sport"="fitness"](area.searchArea);
+  way["sport"="fitness"](area.searchArea);
+);
+out center meta;
+"""
+
+# Leaflet callback for FastMarkerCluster rows of [lat, lon, name]
+STATION_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup('OSM: ' + row[2]);
+    return marker;
+};
+"""
 
 
 @dataclass
@@ -37,6 +80,7 @@ class RealCalisthenicsDetector:
         self.auth_url = ("https://identity.dataspace.copernicus.eu/auth/realms/"
                         "CDSE/protocol/openid-connect/token")
         self.access_token = None
+        self.token_expires_at = 0.0
         
         # OSM integration
         self.osm_url = "http://overpass-api.de/api/interpreter"
@@ -45,6 +89,21 @@ class RealCalisthenicsDetector:
         self.dusseldorf_bbox = [6.65, 51.10, 6.95, 51.35]
         self.min_area = 50    # m²
         self.max_area = 400   # m²
+        
+        # Reuse a token from a previous run if it is still valid
+        self._tokens = TokenCache(username=os.getenv('COPERNICUS_USERNAME'))
+        cached = self._tokens.load_valid()
+        if cached:
+            self._use_token(cached)
+    
+    def _use_token(self, entry: Dict):
+        """Adopt a cached token entry, expiring it early so it never runs out mid-request."""
+        self.access_token = entry['access_token']
+        self.token_expires_at = entry['expires_at'] - EXPIRY_SLACK_S
+    
+    def has_valid_token(self) -> bool:
+        """Check whether the current access token can still be used."""
+        return self.access_token is not None and self.token_expires_at > time.time()
     
     def authenticate_copernicus(self, username: str, password: str) -> bool:
         """Authenticate with Copernicus Data Space."""
@@ -59,7 +118,8 @@ class RealCalisthenicsDetector:
             response = requests.post(self.auth_url, data=auth_data, timeout=30)
             
             if response.status_code == 200:
-                self.access_token = response.json()['access_token']
+                self._tokens = TokenCache(username=username)
+                self._use_token(self._tokens.save(response.json()))
                 print("✅ Copernicus authentication successful")
                 return True
             else:
@@ -70,8 +130,71 @@ class RealCalisthenicsDetector:
             print(f"❌ Authentication error: {e}")
             return False
     
-    def get_best_sentinel2_image(self, days_back: int = 30) -> Dict:
-        """Get the best recent Sentinel-2 image for Düsseldorf."""
+    def refresh_copernicus_token(self) -> bool:
+        """Get a new access token from the cached refresh token, without resending the password."""
+        entry = self._tokens.refresh()
+        if not entry:
+            return False
+        
+        self._use_token(entry)
+        print("✅ Copernicus token refreshed")
+        return True
+    
+    def _search_catalog(self, search_data: Dict) -> Optional[List[Dict]]:
+        """
+        Run a STAC catalog search and collect the features of every result page.
+        
+        Responses are cached on disk, keyed by the search payload
+        (area, date range and cloud filter), so repeated searches within
+        CATALOG_CACHE_TTL_S skip the network.
+        """
+        cache_key = hashlib.sha1(orjson.dumps(search_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        cache_file = CATALOG_CACHE_DIR / f"{cache_key}.json"
+        
+        if cache_file.exists() and time.time() - cache_file.stat().st_mtime < CATALOG_CACHE_TTL_S:
+            return orjson.loads(cache_file.read_bytes())
+        
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        url, method, body = self.sentinel_hub_url, 'POST', search_data
+        features = []
+        
+        while url:
+            if method == 'POST':
+                response = requests.post(url, json=body, headers=headers, timeout=30)
+            else:
+                response = requests.get(url, headers=headers, timeout=30)
+            
+            if response.status_code != 200:
+                print(f"❌ Sentinel-2 search failed: {response.status_code}")
+                return None
+            
+            data = orjson.loads(response.content)
+            features.extend(data.get('features', []))
+            
+            # Follow the STAC "next" link until all pages are fetched
+            next_link = next((link for link in data.get('links', []) if link.get('rel') == 'next'), None)
+            if next_link is None:
+                break
+            url = next_link['href']
+            method = next_link.get('method', 'GET').upper()
+            body = {**search_data, **next_link.get('body', {})}
+        
+        CATALOG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_file.write_bytes(orjson.dumps(features))
+        
+        return features
+    
+    def get_best_sentinel2_image(self, days_back: int = 30, max_cloud_cover: float = 40.0,
+                                 aois: Optional[List[List[float]]] = None) -> Dict:
+        """
+        Get the best recent Sentinel-2 image for Düsseldorf.
+        
+        Args:
+            days_back: Number of days to search back from today
+            max_cloud_cover: Maximum cloud cover percentage
+            aois: Optional list of [west, south, east, north] boxes searched together
+                  in one request instead of the Düsseldorf bbox
+        """
         
         print(f"🛰️ Finding best Sentinel-2 image (last {days_back} days)")
         
@@ -79,107 +202,94 @@ class RealCalisthenicsDetector:
         start_date = end_date - timedelta(days=days_back)
         
         search_data = {
-            "bbox": self.dusseldorf_bbox,
             "datetime": f"{start_date.strftime('%Y-%m-%d')}T00:00:00Z/{end_date.strftime('%Y-%m-%d')}T23:59:59Z",
             "collections": ["sentinel-2-l2a"],
-            "limit": 10,
-            "filter": "eo:cloud_cover <= 40"
+            "limit": 100,
+            "filter": f"eo:cloud_cover <= {max_cloud_cover}"
         }
         
+        if aois:
+            search_data["intersects"] = {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [[[w, s], [e, s], [e, n], [w, n], [w, s]]] for w, s, e, n in aois
+                ]
+            }
+        else:
+            search_data["bbox"] = self.dusseldorf_bbox
+        
         try:
-            headers = {'Authorization': f'Bearer {self.access_token}'}
-            response = requests.post(self.sentinel_hub_url, json=search_data, 
-                                   headers=headers, timeout=30)
+            features = self._search_catalog(search_data)
             
-            if response.status_code == 200:
-                data = response.json()
-                features = data.get('features', [])
+            if features is None:
+                return None
+            
+            if features:
+                # Get best image (lowest cloud cover)
+                best_image = min(features, key=lambda x: x.get('properties', {}).get('eo:cloud_cover', 100))
                 
-                if features:
-                    # Get best image (lowest cloud cover)
-                    best_image = min(features, key=lambda x: x.get('properties', {}).get('eo:cloud_cover', 100))
-                    
-                    cloud_cover = best_image['properties']['eo:cloud_cover']
-                    date = best_image['properties']['datetime'][:10]
-                    
-                    print(f"✅ Best image: {date}, cloud cover: {cloud_cover:.1f}%")
-                    
-                    return {
-                        'id': best_image['id'],
-                        'date': date,
-                        'cloud_cover': cloud_cover,
-                        'bbox': best_image['bbox'],
-                        'assets': best_image.get('assets', {})
-                    }
-                else:
-                    print("⚠️ No suitable images found")
-                    return None
-                    
+                cloud_cover = best_image['properties']['eo:cloud_cover']
+                date = best_image['properties']['datetime'][:10]
+                
+                print(f"✅ Best image: {date}, cloud cover: {cloud_cover:.1f}% ({len(features)} searched)")
+                
+                return {
+                    'id': best_image['id'],
+                    'date': date,
+                    'cloud_cover': cloud_cover,
+                    'bbox': best_image['bbox'],
+                    'assets': best_image.get('assets', {})
+                }
             else:
-                print(f"❌ Sentinel-2 search failed: {response.status_code}")
+                print("⚠️ No suitable images found")
                 return None
                 
         except Exception as e:
             print(f"❌ Sentinel-2 search error: {e}")
             return None
     
-    def get_osm_fitness_stations(self) -> List[Dict]:
+    def get_osm_fitness_stations(self) -> pd.DataFrame:
         """Get fitness stations from OpenStreetMap."""
         
         print("🗺️ Loading fitness stations from OpenStreetMap")
         
-        # Query for fitness stations in Düsseldorf
-        query = """
-        [out:json][timeout:25];
-        (
-          area["name"="Düsseldorf"]["admin_level"="6"];
-        )->.searchArea;
-        (
-          node["leisure"="fitness_station"](area.searchArea);
-          way["leisure"="fitness_station"](area.searchArea);
-          node["sport"="fitness"](area.searchArea);
-          way["sport"="fitness"](area.searchArea);
-        );
-        out center meta;
-        """
-        
         try:
-            response = requests.post(self.osm_url, data=query, timeout=30)
+            response = requests.post(self.osm_url, data=OSM_FITNESS_QUERY, timeout=30,
+                                      headers={'Accept-Encoding': 'gzip, deflate, br'})
             
             if response.status_code == 200:
-                data = response.json()
-                
-                fitness_stations = []
-                for element in data.get('elements', []):
-                    if element['type'] == 'node':
-                        lat, lon = element['lat'], element['lon']
-                    elif 'center' in element:
-                        lat, lon = element['center']['lat'], element['center']['lon']
-                    else:
-                        continue
-                    
-                    tags = element.get('tags', {})
-                    
-                    fitness_stations.append({
-                        'lat': lat,
-                        'lon': lon,
-                        'name': tags.get('name', f"Fitness Station {element['id']}"),
-                        'tags': tags,
-                        'osm_id': element['id']
-                    })
+                data = orjson.loads(response.content)
+                fitness_stations = self._parse_fitness_stations(data.get('elements', []))
                 
                 print(f"✅ Found {len(fitness_stations)} fitness stations in OSM")
                 return fitness_stations
                 
             else:
                 print(f"❌ OSM query failed: {response.status_code}")
-                return []
+                return self._parse_fitness_stations([])
                 
         except Exception as e:
             print(f"❌ OSM error: {e}")
-            return []
+            return self._parse_fitness_stations([])
     
-    def simulate_sentinel2_analysis(self, image_info: Dict, osm_stations: List[Dict]) -> np.ndarray:
+    def _parse_fitness_stations(self, elements: List[Dict]) -> pd.DataFrame:
+        """
+        Turn Overpass elements into a station table with typed
+        lat/lon/osm_id columns plus name and tags.
+        """
+        located = [e for e in elements if e['type'] == 'node' or 'center' in e]
+        coords = [e if e['type'] == 'node' else e['center'] for e in located]
+        tags = [e.get('tags', {}) for e in located]
+        
+        return pd.DataFrame({
+            'lat': np.fromiter((c['lat'] for c in coords), dtype=np.float64, count=len(coords)),
+            'lon': np.fromiter((c['lon'] for c in coords), dtype=np.float64, count=len(coords)),
+            'osm_id': np.fromiter((e['id'] for e in located), dtype=np.int64, count=len(located)),
+            'name': [t.get('name', f"Fitness Station {e['id']}") for e, t in zip(located, tags)],
+            'tags': tags
+        })
+    
+    def simulate_sentinel2_analysis(self, image_info: Dict, osm_stations: pd.DataFrame) -> np.ndarray:
         """
         Simulate Sentinel-2 NDVI analysis based on real image bounds and OSM locations.
         
@@ -205,25 +315,27 @@ class RealCalisthenicsDetector:
         # Add fitness equipment signatures at real OSM locations
         equipment_count = 0
         
-        for station in osm_stations:
-            # Check if station is within image bounds
-            if west <= station['lon'] <= east and south <= station['lat'] <= north:
-                # Convert lat/lon to pixel coordinates
-                pixel_x = int(((station['lon'] - west) / (east - west)) * size)
-                pixel_y = int(((north - station['lat']) / (north - south)) * size)
-                
-                # Add equipment signature (low NDVI)
-                equipment_size = np.random.randint(3, 8)  # 3-8 pixels
-                y1 = max(0, pixel_y - equipment_size)
-                y2 = min(size, pixel_y + equipment_size)
-                x1 = max(0, pixel_x - equipment_size)
-                x2 = min(size, pixel_x + equipment_size)
-                
-                # Equipment areas: low NDVI (0.1-0.3)
-                base_ndvi[y1:y2, x1:x2] = np.random.normal(0.2, 0.05, (y2-y1, x2-x1))
-                equipment_count += 1
-                
-                print(f"   Added equipment signature for {station['name']} at pixel ({pixel_x}, {pixel_y})")
+        # Only stations within image bounds
+        in_bounds = osm_stations[osm_stations['lon'].between(west, east) &
+                                 osm_stations['lat'].between(south, north)]
+        
+        for station in in_bounds.itertuples(index=False):
+            # Convert lat/lon to pixel coordinates
+            pixel_x = int(((station.lon - west) / (east - west)) * size)
+            pixel_y = int(((north - station.lat) / (north - south)) * size)
+            
+            # Add equipment signature (low NDVI)
+            equipment_size = np.random.randint(3, 8)  # 3-8 pixels
+            y1 = max(0, pixel_y - equipment_size)
+            y2 = min(size, pixel_y + equipment_size)
+            x1 = max(0, pixel_x - equipment_size)
+            x2 = min(size, pixel_x + equipment_size)
+            
+            # Equipment areas: low NDVI (0.1-0.3)
+            base_ndvi[y1:y2, x1:x2] = np.random.normal(0.2, 0.05, (y2-y1, x2-x1))
+            equipment_count += 1
+            
+            log.debug("Added equipment signature for %s at pixel (%d, %d)", station.name, pixel_x, pixel_y)
         
         print(f"✅ Created NDVI map with {equipment_count} equipment signatures")
         
@@ -244,73 +356,68 @@ class RealCalisthenicsDetector:
         equipment_mask = cv.morphologyEx(equipment_mask, cv.MORPH_CLOSE, kernel)
         equipment_mask = cv.morphologyEx(equipment_mask, cv.MORPH_OPEN, kernel)
         
-        # Find contours
-        contours, _ = cv.findContours(equipment_mask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+        # Label blobs; areas and centroids come back from the same pass
+        num_labels, labels, stats, centroids = cv.connectedComponentsWithStats(
+            equipment_mask, connectivity=8, ltype=cv.CV_32S)
+        
+        # Drop the background label 0
+        areas_pixels = stats[1:, cv.CC_STAT_AREA]
+        areas_m2 = areas_pixels * 100  # 10m pixels = 100m² per pixel
+        
+        # Mean NDVI per label from one weighted histogram instead of a mask per blob
+        ndvi_sums = np.bincount(labels.ravel(), weights=ndvi.ravel(), minlength=num_labels)[1:]
+        mean_ndvis = ndvi_sums / areas_pixels
+        
+        # Size filter
+        keep = (areas_m2 >= self.min_area) & (areas_m2 <= self.max_area)
         
         detections = []
         
-        for contour in contours:
-            area_pixels = cv.contourArea(contour)
-            area_m2 = area_pixels * 100  # 10m pixels = 100m² per pixel
+        for (cx, cy), area_m2, mean_ndvi in zip(centroids[1:][keep], areas_m2[keep], mean_ndvis[keep]):
+            # Convert pixel coordinates back to lat/lon
+            lon = west + (cx / ndvi.shape[1]) * (east - west)
+            lat = north - (cy / ndvi.shape[0]) * (north - south)
             
-            # Size filter
-            if self.min_area <= area_m2 <= self.max_area:
-                # Get centroid
-                M = cv.moments(contour)
-                if M['m00'] > 0:
-                    cx = int(M['m10'] / M['m00'])
-                    cy = int(M['m01'] / M['m00'])
-                    
-                    # Convert pixel coordinates back to lat/lon
-                    lon = west + (cx / ndvi.shape[1]) * (east - west)
-                    lat = north - (cy / ndvi.shape[0]) * (north - south)
-                    
-                    # Calculate NDVI signature
-                    mask = np.zeros_like(ndvi, dtype=np.uint8)
-                    cv.fillPoly(mask, [contour], 1)
-                    ndvi_values = ndvi[mask == 1]
-                    mean_ndvi = np.mean(ndvi_values)
-                    
-                    # Basic confidence based on NDVI signature and size
-                    ndvi_confidence = 1.0 - abs(mean_ndvi - 0.2) / 0.3  # Target NDVI ~0.2
-                    size_confidence = min(area_m2 / 200, 1.0)  # Normalize by typical size
-                    base_confidence = (ndvi_confidence + size_confidence) / 2
-                    
-                    detections.append(CalisthenicsDetection(
-                        lat=lat,
-                        lon=lon,
-                        confidence=base_confidence,
-                        area_m2=area_m2,
-                        ndvi_signature=mean_ndvi,
-                        osm_validated=False,  # Will be set in validation
-                        osm_distance_m=float('inf')
-                    ))
+            # Basic confidence based on NDVI signature and size
+            ndvi_confidence = 1.0 - abs(mean_ndvi - 0.2) / 0.3  # Target NDVI ~0.2
+            size_confidence = min(area_m2 / 200, 1.0)  # Normalize by typical size
+            base_confidence = (ndvi_confidence + size_confidence) / 2
+            
+            detections.append(CalisthenicsDetection(
+                lat=float(lat),
+                lon=float(lon),
+                confidence=float(base_confidence),
+                area_m2=float(area_m2),
+                ndvi_signature=float(mean_ndvi),
+                osm_validated=False,  # Will be set in validation
+                osm_distance_m=float('inf')
+            ))
         
         print(f"✅ Found {len(detections)} potential equipment areas")
         return detections
     
     def validate_with_osm(self, detections: List[CalisthenicsDetection], 
-                         osm_stations: List[Dict]) -> List[CalisthenicsDetection]:
+                         osm_stations: pd.DataFrame) -> List[CalisthenicsDetection]:
         """Validate detections against OSM fitness stations."""
         
         print("🔍 Validating detections against OSM...")
         
         validated_detections = []
         
+        station_lats = osm_stations['lat'].to_numpy()
+        station_lons = osm_stations['lon'].to_numpy()
+        
         for detection in detections:
             min_distance = float('inf')
             closest_station = None
             
             # Find closest OSM station
-            for station in osm_stations:
+            if len(osm_stations):
                 # Calculate distance (rough)
-                lat_diff = detection.lat - station['lat']
-                lon_diff = detection.lon - station['lon']
-                distance = ((lat_diff**2 + lon_diff**2) ** 0.5) * 111000  # Rough conversion to meters
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_station = station
+                distances = np.hypot(detection.lat - station_lats, detection.lon - station_lons) * 111000
+                closest = int(np.argmin(distances))
+                min_distance = float(distances[closest])
+                closest_station = osm_stations['name'].iat[closest]
             
             # Update detection with OSM validation
             detection.osm_distance_m = min_distance
@@ -318,7 +425,8 @@ class RealCalisthenicsDetector:
             if min_distance <= 200:  # Within 200m
                 detection.osm_validated = True
                 detection.confidence = min(0.95, detection.confidence + 0.3)  # Boost confidence
-                print(f"✅ Detection at {detection.lat:.4f}, {detection.lon:.4f} matches OSM station: {closest_station['name']} (distance: {min_distance:.0f}m)")
+                log.debug("Detection at %.4f, %.4f matches OSM station: %s (distance: %.0fm)",
+                          detection.lat, detection.lon, closest_station, min_distance)
             else:
                 detection.osm_validated = False
                 detection.confidence *= 0.7  # Reduce confidence
@@ -331,44 +439,49 @@ class RealCalisthenicsDetector:
         return validated_detections
     
     def create_results_map(self, detections: List[CalisthenicsDetection], 
-                          osm_stations: List[Dict]) -> str:
+                          osm_stations: pd.DataFrame) -> str:
         """Create interactive map with results."""
         
         # Center map on Düsseldorf
         center_lat = (self.dusseldorf_bbox[1] + self.dusseldorf_bbox[3]) / 2
         center_lon = (self.dusseldorf_bbox[0] + self.dusseldorf_bbox[2]) / 2
         
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
+        m = folium.Map(location=[center_lat, center_lon], zoom_start=12, prefer_canvas=True)
         
-        # Add OSM fitness stations
-        for station in osm_stations:
-            folium.Marker(
-                [station['lat'], station['lon']],
-                popup=f"OSM: {station['name']}",
-                icon=folium.Icon(color='blue', icon='dumbbell', prefix='fa')
-            ).add_to(m)
+        # Add OSM fitness stations as one clustered JS array instead of one marker block each
+        FastMarkerCluster(
+            data=osm_stations[['lat', 'lon', 'name']].values.tolist(),
+            callback=STATION_MARKER_CALLBACK
+        ).add_to(m)
         
-        # Add detections
+        # Add detections as a single FeatureCollection
+        features = []
         for detection in detections:
-            color = 'green' if detection.osm_validated else 'orange'
-            status = "✅ OSM Verified" if detection.osm_validated else "🔍 Detected"
-            
-            popup_text = f"""
-            {status}<br>
-            Confidence: {detection.confidence:.3f}<br>
-            Area: {detection.area_m2:.0f}m²<br>
-            NDVI: {detection.ndvi_signature:.3f}<br>
-            OSM Distance: {detection.osm_distance_m:.0f}m
-            """
-            
-            folium.CircleMarker(
-                [detection.lat, detection.lon],
-                radius=8,
-                popup=popup_text,
-                color=color,
-                fill=True,
-                fillOpacity=0.7
-            ).add_to(m)
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [detection.lon, detection.lat]},
+                'properties': {
+                    'status': "✅ OSM Verified" if detection.osm_validated else "🔍 Detected",
+                    'color': 'green' if detection.osm_validated else 'orange',
+                    'confidence': round(detection.confidence, 3),
+                    'area_m2': round(detection.area_m2),
+                    'ndvi': round(detection.ndvi_signature, 3),
+                    'osm_distance_m': round(detection.osm_distance_m) if np.isfinite(detection.osm_distance_m) else None
+                }
+            })
+        
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            marker=folium.CircleMarker(radius=8, fill=True, fill_opacity=0.7),
+            style_function=lambda feature: {
+                'color': feature['properties']['color'],
+                'fillColor': feature['properties']['color']
+            },
+            popup=folium.GeoJsonPopup(
+                fields=['status', 'confidence', 'area_m2', 'ndvi', 'osm_distance_m'],
+                aliases=['Status', 'Confidence', 'Area (m²)', 'NDVI', 'OSM Distance (m)']
+            )
+        ).add_to(m)
         
         # Save map
         map_file = "../results/calisthenics_detection_results.html"
@@ -388,16 +501,17 @@ def run_complete_detection():
     # Step 1: Authenticate
     print("\n1️⃣ AUTHENTICATION")
     
-    # Load credentials from environment variables or credentials file
-    import os
-    import json
-    from pathlib import Path
+    # Reuse the cached token (or refresh it) before asking for credentials
+    token_cached = detector.has_valid_token() or detector.refresh_copernicus_token()
+    if token_cached:
+        print("✅ Using cached Copernicus token")
     
+    # Load credentials from environment variables or credentials file
     username = os.getenv('COPERNICUS_USERNAME')
     password = os.getenv('COPERNICUS_PASSWORD')
     
     # Try loading from credentials file if env vars not set
-    if not username or not password:
+    if not token_cached and (not username or not password):
         credential_paths = [
             Path(__file__).parent.parent / 'copernicus_credentials.json',
             Path.home() / '.copernicus_credentials.json',
@@ -416,13 +530,13 @@ def run_complete_detection():
                 except Exception as e:
                     print(f"⚠️ Could not load {cred_path}: {e}")
     
-    if not username or not password:
+    if not token_cached and (not username or not password):
         print("❌ Credentials not found!")
         print("   Set COPERNICUS_USERNAME and COPERNICUS_PASSWORD environment variables,")
         print("   or create copernicus_credentials.json with your credentials.")
         return None
     
-    if not detector.authenticate_copernicus(username, password):
+    if not token_cached and not detector.authenticate_copernicus(username, password):
         print("❌ Cannot proceed without authentication")
         return
     
@@ -438,7 +552,7 @@ def run_complete_detection():
     print("\n3️⃣ GROUND TRUTH DATA (OpenStreetMap)")
     osm_stations = detector.get_osm_fitness_stations()
     
-    if not osm_stations:
+    if osm_stations.empty:
         print("⚠️ No OSM fitness stations found, continuing with detection only")
     
     # Step 4: Analyze satellite data
@@ -488,4 +602,6 @@ def run_complete_detection():
 
 
 if __name__ == "__main__":
+    # Per-station/per-detection details are logged at DEBUG; set LOG_LEVEL=DEBUG to see them
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'), format='%(message)s')
     results = run_complete_detection()
\ No newline at end of file
@@ -8,6 +8,22 @@ Let's analyze what went wrong with our detection method.
 import requests
 import numpy as np
 
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+
+# Anything leisure/sport/fitness related within 500m of a point
+OSM_NEAR_QUERY_TEMPLATE = """
+[out:json][timeout:15];
+(
+  node(around:500,{lat},{lon})["leisure"];
+  way(around:500,{lat},{lon})["leisure"];
+  node(around:500,{lat},{lon})["sport"];
+  way(around:500,{lat},{lon})["sport"];
+  node(around:500,{lat},{lon})["fitness"];
+  way(around:500,{lat},{lon})["fitness"];
+);
+out center meta;
+"""
+
 def debug_known_parks():
     """Debug why known calisthenics parks were not detected."""
     
@@ -77,29 +93,17 @@ def debug_known_parks():
 def check_osm_at_known_locations(known_parks):
     """Check what OSM says about our known calisthenics locations."""
     
-    overpass_url = "http://overpass-api.de/api/interpreter"
-    
     for park in known_parks:
         lat, lon = park['lat'], park['lon']
         
         print(f"🔍 Checking OSM near {park['name']}:")
         
         # Query for anything near this location (500m radius)
-        query = f"""
-        [out:json][timeout:15];
-        (
-          node(around:500,{lat},{lon})["leisure"];
-          way(around:500,{lat},{lon})["leisure"];
-          node(around:500,{lat},{lon})["sport"];
-          way(around:500,{lat},{lon})["sport"];
-          node(around:500,{lat},{lon})["fitness"];
-          way(around:500,{lat},{lon})["fitness"];
-        );
-        out center meta;
-        """
+        query = OSM_NEAR_QUERY_TEMPLATE.format(lat=lat, lon=lon)
         
         try:
-            response = requests.post(overpass_url, data=query, timeout=20)
+            response = requests.post(OVERPASS_URL, data=query, timeout=20,
+                                     headers={'Accept-Encoding': 'gzip, deflate, br'})
             
             if response.status_code == 200:
                 data = response.json()
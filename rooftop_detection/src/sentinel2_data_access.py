@@ -7,18 +7,34 @@ Two approaches: 1) Direct API access, 2) Local/cached data integration
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import json
+import gzip
+import hashlib
+import orjson
 import os
+import shutil
+import threading
+import time
 from pathlib import Path
-# import rasterio  # Optional - only for real data downloads
-# from rasterio.windows import from_bounds
+from concurrent.futures import ThreadPoolExecutor
+import rasterio
+from rasterio.windows import from_bounds
+from rasterio.enums import Resampling
+from token_cache import EXPIRY_SLACK_S, TokenCache
 import warnings
 warnings.filterwarnings('ignore')
 
 
+def to_reflectance(band: np.ndarray) -> np.ndarray:
+    """Convert Sentinel-2 uint16 digital numbers to float32 reflectance (0-1)."""
+    return band.astype(np.float32, copy=False) * np.float32(1e-4)
+
+
 class Sentinel2DataAccess:
     """
     Access real Sentinel-2 data from Copernicus Data Space Ecosystem.
@@ -31,21 +47,53 @@ class Sentinel2DataAccess:
     def __init__(self):
         self.api_base = "https://catalogue.dataspace.copernicus.eu"
         self.download_base = "https://zipper.dataspace.copernicus.eu"
+        self.auth_url = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
         self.access_token = None
+        self._refresh_token = None
+        self._token_expiry = 0.0
+        self._token_lock = threading.Lock()
+        self._tokens = TokenCache()
+        
+        # One keep-alive connection pool for auth, search and band downloads,
+        # retrying rate limits and gateway errors
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = 'CalisthenicsDetector/1.0'
+        # Compressed responses; requests decodes gzip, and br once brotli is installed
+        self._session.headers['Accept-Encoding'] = 'gzip, deflate, br'
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[429, 502, 503, 504],
+                              allowed_methods=frozenset(['GET', 'POST']))
+        )
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
         
         # Cache directory for downloaded data
         self.cache_dir = Path("../data/sentinel2_cache")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # product_id -> cached band files, mirrored to manifest.json on every download
+        self.manifest_file = self.cache_dir / "manifest.json"
+        self._manifest = None
+        self._manifest_lock = threading.Lock()
     
     def authenticate(self, username: str, password: str) -> bool:
         """
         Authenticate with Copernicus Data Space Ecosystem.
         
         Register for free at: https://dataspace.copernicus.eu/
+        
+        A still-valid token cached for this account is reused without a request.
         """
+        self._tokens = TokenCache(username=username)
+        cached = self._tokens.load_valid()
+        if cached:
+            self._use_token(cached)
+            print("✅ Using cached Copernicus token")
+            return True
+        
         try:
-            auth_url = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
-            
             auth_data = {
                 'grant_type': 'password',
                 'username': username,
@@ -53,11 +101,10 @@ class Sentinel2DataAccess:
                 'client_id': 'cdse-public'
             }
             
-            response = requests.post(auth_url, data=auth_data, timeout=30)
+            response = self._session.post(self.auth_url, data=auth_data, timeout=30)
             
             if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
+                self._store_token(response.json())
                 print("✅ Successfully authenticated with Copernicus Data Space!")
                 return True
             else:
@@ -68,6 +115,55 @@ class Sentinel2DataAccess:
             print(f"❌ Authentication error: {e}")
             return False
     
+    def _store_token(self, token_data: Dict):
+        """Cache a token response on disk and switch the session to its access token."""
+        entry = self._tokens.save(token_data)
+        self._use_token(entry)
+    
+    def _use_token(self, entry: Dict):
+        """Keep the access token, its refresh token and expiry (with EXPIRY_SLACK_S slack)."""
+        self.access_token = entry['access_token']
+        self._refresh_token = entry.get('refresh_token')
+        self._token_expiry = entry['expires_at'] - EXPIRY_SLACK_S
+        self._session.headers['Authorization'] = f'Bearer {self.access_token}'
+    
+    def _ensure_token(self) -> bool:
+        """
+        Refresh the access token if it is about to expire.
+        
+        Returns:
+            True if a usable access token is set
+        """
+        if time.time() < self._token_expiry:
+            return True
+        
+        with self._token_lock:
+            # Another download thread may have refreshed while we waited
+            if time.time() < self._token_expiry:
+                return True
+            if not self._refresh_token:
+                # Token set without a refresh token: use it as-is
+                if self.access_token:
+                    self._session.headers['Authorization'] = f'Bearer {self.access_token}'
+                return self.access_token is not None
+            
+            response = self._session.post(
+                self.auth_url,
+                data={
+                    'grant_type': 'refresh_token',
+                    'refresh_token': self._refresh_token,
+                    'client_id': 'cdse-public'
+                },
+                timeout=30
+            )
+            
+            if response.status_code != 200:
+                print(f"❌ Token refresh failed: {response.status_code}")
+                return False
+            
+            self._store_token(response.json())
+            return True
+    
     def search_sentinel2_products(self, bbox: Tuple[float, float, float, float],
                                 start_date: str, end_date: str,
                                 max_cloud_cover: float = 20.0) -> List[Dict]:
@@ -113,10 +209,9 @@ class Sentinel2DataAccess:
                 '$top': '10'
             }
             
-            response = requests.get(search_url, params=params, timeout=30)
+            response, data = self._conditional_get(search_url, params)
             
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
                 products = data.get('value', [])
                 
                 print(f"✅ Found {len(products)} Sentinel-2 products")
@@ -144,6 +239,48 @@ class Sentinel2DataAccess:
             print(f"❌ Search error: {e}")
             return []
     
+    def _conditional_get(self, url: str, params: Dict) -> Tuple[requests.Response, Optional[Dict]]:
+        """
+        GET a JSON resource, revalidating a previously cached body via ETag / Last-Modified.
+        
+        Returns:
+            The response and its parsed JSON (the cached body on 304), or None on error
+        """
+        request_key = json.dumps([url, params], sort_keys=True)
+        cache_file = self.cache_dir / f"search_{hashlib.sha1(request_key.encode()).hexdigest()}.json.gz"
+        
+        cached = None
+        if cache_file.exists():
+            try:
+                with gzip.open(cache_file, 'rb') as f:
+                    cached = orjson.loads(f.read())
+            except (OSError, ValueError):
+                cached = None
+        
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        
+        response = self._session.get(url, params=params, headers=headers, timeout=30)
+        
+        if response.status_code == 304 and cached:
+            return response, cached['body']
+        if response.status_code != 200:
+            return response, None
+        
+        body = orjson.loads(response.content)
+        if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+            with gzip.open(cache_file, 'wb', compresslevel=1) as f:
+                f.write(orjson.dumps({
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'body': body
+                }))
+        
+        return response, body
+    
     def _extract_cloud_cover(self, product: Dict) -> float:
         """Extract cloud cover from product attributes."""
         try:
@@ -155,7 +292,8 @@ class Sentinel2DataAccess:
             return 0
     
     def download_product_bands(self, product_id: str, bands: List[str] = None,
-                             bbox: Tuple[float, float, float, float] = None) -> Dict[str, np.ndarray]:
+                             bbox: Tuple[float, float, float, float] = None,
+                             overview_level: int = 0) -> Dict[str, np.ndarray]:
         """
         Download specific bands from a Sentinel-2 product.
         
@@ -163,9 +301,12 @@ class Sentinel2DataAccess:
             product_id: Product ID from search results
             bands: List of band names (e.g., ['B04', 'B08', 'B02', 'B03'])
             bbox: Spatial subset bounds (west, south, east, north)
+            overview_level: Downsample by 2**overview_level using the JP2 resolution
+                levels (0 = full resolution)
             
         Returns:
-            Dictionary mapping band names to numpy arrays
+            Dictionary mapping band names to uint16 digital-number arrays
+            (use to_reflectance() to get 0-1 reflectance)
         """
         if bands is None:
             bands = ['B04', 'B08']  # Red and NIR for NDVI
@@ -176,68 +317,111 @@ class Sentinel2DataAccess:
             print("❌ Not authenticated! Call authenticate() first.")
             return {}
         
-        downloaded_bands = {}
+        # Fetch all bands in parallel over the shared session; wall time is roughly the slowest band
+        with ThreadPoolExecutor(max_workers=max(1, len(bands))) as executor:
+            results = executor.map(lambda band: self._download_band(product_id, band, bbox, overview_level), bands)
+            downloaded_bands = {band: data for band, data in zip(bands, results) if data is not None}
         
-        for band in bands:
-            try:
-                # Download band data
-                band_url = f"{self.download_base}/odata/v1/Products({product_id})/Nodes('{band}.jp2')/$value"
+        return downloaded_bands
+    
+    def _download_band(self, product_id: str, band: str,
+                       bbox: Optional[Tuple[float, float, float, float]],
+                       overview_level: int = 0) -> Optional[np.ndarray]:
+        """Download one band to the cache and read it back; returns None on failure."""
+        try:
+            # Download band data
+            band_url = f"{self.download_base}/odata/v1/Products({product_id})/Nodes('{band}.jp2')/$value"
+            
+            if not self._ensure_token():
+                print(f"❌ Failed to download {band}: no valid access token")
+                return None
+            
+            with self._session.get(band_url, stream=True, timeout=60) as response:
+                if response.status_code != 200:
+                    print(f"❌ Failed to download {band}: {response.status_code}")
+                    return None
                 
-                headers = {'Authorization': f'Bearer {self.access_token}'}
-                response = requests.get(band_url, headers=headers, stream=True, timeout=60)
+                # Save to cache, copying the raw stream in 1 MB blocks
+                cache_file = self.cache_dir / f"{product_id}_{band}.jp2"
+                response.raw.decode_content = True
                 
-                if response.status_code == 200:
-                    # Save to cache
-                    cache_file = self.cache_dir / f"{product_id}_{band}.jp2"
-                    
-                    with open(cache_file, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    
-                    # Read with rasterio
-                    with rasterio.open(cache_file) as src:
-                        if bbox:
-                            # Read spatial subset
-                            window = from_bounds(*bbox, src.transform)
-                            data = src.read(1, window=window)
-                        else:
-                            # Read full image
-                            data = src.read(1)
-                        
-                        # Convert to reflectance (divide by 10000)
-                        data = data.astype(np.float32) / 10000.0
-                        downloaded_bands[band] = data
-                        
-                        print(f"✅ Downloaded {band}: {data.shape} pixels")
-                        
+                with open(cache_file, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+            
+            self._record_in_manifest(product_id, band, cache_file)
+            
+            # Read with rasterio, decoding only the bbox window and, for previews,
+            # a coarser JP2 resolution level instead of downsampling in Python
+            with rasterio.open(cache_file) as src:
+                window = from_bounds(*bbox, src.transform) if bbox else None
+                if window is not None:
+                    height, width = int(round(window.height)), int(round(window.width))
                 else:
-                    print(f"❌ Failed to download {band}: {response.status_code}")
-                    
-            except Exception as e:
-                print(f"❌ Error downloading {band}: {e}")
-        
-        return downloaded_bands
+                    height, width = src.height, src.width
+                
+                data = src.read(
+                    1,
+                    window=window,
+                    out_shape=(max(1, height >> overview_level), max(1, width >> overview_level)),
+                    resampling=Resampling.average
+                )
+            
+            # Keep native uint16 DNs; reflectance is computed on demand
+            print(f"✅ Downloaded {band}: {data.shape} pixels")
+            return data
+                
+        except Exception as e:
+            print(f"❌ Error downloading {band}: {e}")
+            return None
+    
+    def _load_manifest(self) -> Optional[Dict]:
+        """Load manifest.json once; None if there is none yet."""
+        if self._manifest is None and self.manifest_file.exists():
+            try:
+                self._manifest = orjson.loads(self.manifest_file.read_bytes())
+            except (OSError, ValueError):
+                self._manifest = None
+        return self._manifest
+    
+    def _record_in_manifest(self, product_id: str, band: str, cache_file: Path):
+        """Add a downloaded band to the manifest and rewrite manifest.json atomically."""
+        with self._manifest_lock:
+            manifest = self._load_manifest() or {}
+            entry = manifest.setdefault(product_id, {'bands': {}})
+            entry['bands'][band] = cache_file.name
+            entry['updated'] = time.time()
+            self._manifest = manifest
+            
+            tmp_file = self.manifest_file.with_suffix('.json.tmp')
+            tmp_file.write_bytes(orjson.dumps(manifest))
+            os.replace(tmp_file, self.manifest_file)
     
     def get_sample_data_dusseldorf(self) -> Dict[str, np.ndarray]:
         """
         Get sample Sentinel-2 data for Düsseldorf area.
         
         This uses pre-downloaded sample data or generates realistic synthetic data
-        for testing when real API access is not available.
+        for testing when real API access is not available. Bands are uint16
+        digital numbers (reflectance * 10000).
         """
         print("📋 Loading sample Sentinel-2 data for Düsseldorf...")
         
-        # Check if we have cached real data
-        sample_files = list(self.cache_dir.glob("*_B*.jp2"))
+        # Check if we have cached real data: newest product in the manifest,
+        # or a directory scan for caches written before the manifest existed
+        manifest = self._load_manifest()
+        if manifest:
+            newest = max(manifest.values(), key=lambda entry: entry.get('updated', 0))
+            sample_files = {band: self.cache_dir / name for band, name in newest['bands'].items()}
+        else:
+            sample_files = {file.stem.split('_')[-1]: file for file in self.cache_dir.glob("*_B*.jp2")}
         
         if sample_files:
             print("✅ Found cached Sentinel-2 data")
             # Load from cache
             bands = {}
-            for file in sample_files:
-                band_name = file.stem.split('_')[-1]
+            for band_name, file in sample_files.items():
                 with rasterio.open(file) as src:
-                    bands[band_name] = src.read(1).astype(np.float32) / 10000.0
+                    bands[band_name] = src.read(1)
             return bands
         
         else:
@@ -251,52 +435,63 @@ class Sentinel2DataAccess:
         size = 100
         
         # Generate realistic spectral signatures
-        np.random.seed(42)  # Reproducible
+        rng = np.random.default_rng(42)  # Reproducible
         
         # Base urban/vegetation mix
-        vegetation_mask = np.random.random((size, size)) > 0.3  # 70% vegetation
+        vegetation_mask = rng.random((size, size)) > 0.3  # 70% vegetation
+        
+        # Scratch buffer for the vegetation draw, reused by every band
+        vegetation_values = np.empty((size, size))
+        
+        def mixed_band(veg_mean: float, veg_std: float, urban_mean: float, urban_std: float) -> np.ndarray:
+            # ufunc out= writes into the buffers in place (an augmented assignment would
+            # rebind vegetation_values as a local); the urban draw fills the returned
+            # band directly and copyto overlays the vegetation pixels, so no temporaries
+            rng.standard_normal(out=vegetation_values)
+            np.multiply(vegetation_values, veg_std, out=vegetation_values)
+            np.add(vegetation_values, veg_mean, out=vegetation_values)
+            band = np.empty((size, size))
+            rng.standard_normal(out=band)
+            np.multiply(band, urban_std, out=band)
+            np.add(band, urban_mean, out=band)
+            np.copyto(band, vegetation_values, where=vegetation_mask)
+            return band
         
         # B04 (Red) - vegetation: 0.03-0.06, urban: 0.12-0.18
-        red_band = np.where(vegetation_mask, 
-                           np.random.normal(0.04, 0.01, (size, size)),
-                           np.random.normal(0.15, 0.03, (size, size)))
+        red_band = mixed_band(0.04, 0.01, 0.15, 0.03)
         
         # B08 (NIR) - vegetation: 0.4-0.6, urban: 0.2-0.3  
-        nir_band = np.where(vegetation_mask,
-                           np.random.normal(0.5, 0.05, (size, size)),
-                           np.random.normal(0.25, 0.03, (size, size)))
+        nir_band = mixed_band(0.5, 0.05, 0.25, 0.03)
         
         # B02 (Blue) and B03 (Green) for visualization
-        blue_band = np.where(vegetation_mask,
-                            np.random.normal(0.02, 0.005, (size, size)),
-                            np.random.normal(0.12, 0.02, (size, size)))
-        
-        green_band = np.where(vegetation_mask,
-                             np.random.normal(0.03, 0.01, (size, size)),
-                             np.random.normal(0.13, 0.02, (size, size)))
+        blue_band = mixed_band(0.02, 0.005, 0.12, 0.02)
+        green_band = mixed_band(0.03, 0.01, 0.13, 0.02)
         
         # Add some fitness equipment areas (low NDVI signatures)
-        equipment_centers = [(20, 30), (45, 70), (75, 85)]
+        equipment_centers = np.array([(20, 30), (45, 70), (75, 85)])
         
-        for cx, cy in equipment_centers:
-            # Create equipment signature: higher red, lower NIR
-            y1, y2 = max(0, cy-5), min(size, cy+5)
-            x1, x2 = max(0, cx-5), min(size, cx+5)
-            
-            red_band[y1:y2, x1:x2] = np.random.normal(0.3, 0.05, (y2-y1, x2-x1))
-            nir_band[y1:y2, x1:x2] = np.random.normal(0.2, 0.03, (y2-y1, x2-x1))
+        # 10x10 squares around all centers as one mask, broadcast over the centers
+        cx = equipment_centers[:, 0, None, None]
+        cy = equipment_centers[:, 1, None, None]
+        yy, xx = np.ogrid[:size, :size]
+        equipment_mask = ((yy >= cy - 5) & (yy < cy + 5) & (xx >= cx - 5) & (xx < cx + 5)).any(axis=0)
+        
+        # Equipment signature: higher red, lower NIR
+        n_equipment = np.count_nonzero(equipment_mask)
+        red_band[equipment_mask] = rng.normal(0.3, 0.05, n_equipment)
+        nir_band[equipment_mask] = rng.normal(0.2, 0.03, n_equipment)
         
-        # Clip values to valid range
+        # Clip values to valid range and quantize to Sentinel-2 uint16 DNs
         bands = {
-            'B02': np.clip(blue_band, 0, 1),
-            'B03': np.clip(green_band, 0, 1),
-            'B04': np.clip(red_band, 0, 1),
-            'B08': np.clip(nir_band, 0, 1)
+            'B02': (np.clip(blue_band, 0, 1) * 10000).astype(np.uint16),
+            'B03': (np.clip(green_band, 0, 1) * 10000).astype(np.uint16),
+            'B04': (np.clip(red_band, 0, 1) * 10000).astype(np.uint16),
+            'B08': (np.clip(nir_band, 0, 1) * 10000).astype(np.uint16)
         }
         
         print("✅ Generated realistic sample data:")
         for band, data in bands.items():
-            print(f"   {band}: {data.shape}, range {data.min():.3f}-{data.max():.3f}")
+            print(f"   {band}: {data.shape}, range {data.min() * 1e-4:.3f}-{data.max() * 1e-4:.3f}")
         
         return bands
 
@@ -342,18 +537,21 @@ def test_sentinel2_access():
         
         # Calculate NDVI
         if 'B04' in sample_bands and 'B08' in sample_bands:
-            red = sample_bands['B04']
-            nir = sample_bands['B08']
+            red = to_reflectance(sample_bands['B04'])
+            nir = to_reflectance(sample_bands['B08'])
             
-            ndvi = (nir - red) / (nir + red + 1e-6)
+            # In-place ops: two temporaries instead of four full-size arrays
+            ndvi = np.subtract(nir, red)
+            denominator = np.add(nir, red)
+            denominator += 1e-6
+            ndvi /= denominator
             
             print(f"\n📊 NDVI Analysis:")
             print(f"   Range: {ndvi.min():.3f} to {ndvi.max():.3f}")
             print(f"   Mean: {ndvi.mean():.3f}")
             
             # Equipment detection
-            equipment_areas = (ndvi < 0.3) & (ndvi > -0.2)
-            equipment_pixels = np.sum(equipment_areas)
+            equipment_pixels = np.count_nonzero((ndvi < 0.3) & (ndvi > -0.2))
             
             print(f"   Equipment pixels: {equipment_pixels} ({equipment_pixels/ndvi.size*100:.1f}%)")
     
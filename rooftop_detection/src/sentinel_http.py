@@ -0,0 +1,46 @@
+"""
+Shared HTTP session for Sentinel Hub / Copernicus access
+========================================================
+
+One pooled, retrying requests.Session used by SentinelHubCatalog and
+SentinelSportsDetector, so both reuse the same keep-alive connections.
+Tokens travel per request via BearerAuth; the shared session itself
+never carries an Authorization header.
+"""
+
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from urllib3.util.retry import Retry
+
+
+@lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """
+    Get the process-wide Copernicus session.
+    
+    Returns:
+        requests.Session with a pooled HTTPAdapter that retries GET/POST on 429/502/503/504
+    """
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504],
+                          allowed_methods=frozenset(['GET', 'POST']))
+    ))
+    session.headers['Accept-Encoding'] = 'gzip, deflate, br'
+    return session
+
+
+class BearerAuth(AuthBase):
+    """Attach one caller's bearer token to a request (pass as auth=...)."""
+    
+    def __init__(self, token: str):
+        self.token = token
+    
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        request.headers['Authorization'] = f'Bearer {self.token}'
+        return request
@@ -5,9 +5,26 @@ Sentinel Hub Catalog API - The RIGHT Way to Access Sentinel-2 Data
 Using modern STAC-compatible Sentinel Hub API instead of legacy OData API.
 """
 
-import requests
+import hashlib
+import os
+import time
+import ijson
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from shapely.geometry import MultiPolygon, box
+from shapely.strtree import STRtree
+from sentinel_http import BearerAuth, get_session
+from token_cache import EXPIRY_SLACK_S, TokenCache
+
+# Processed catalog search results, keyed by search payload and reused briefly
+SEARCH_CACHE_DIR = Path.home() / '.cache' / 'social-sports' / 'search'
+SEARCH_CACHE_TTL_S = 60
+
+# Responses at least this large (or of unknown size) are parsed incrementally
+STREAM_PARSE_MIN_BYTES = 256 * 1024
 
 
 class SentinelHubCatalog:
@@ -17,17 +34,50 @@ class SentinelHubCatalog:
     This is the RECOMMENDED way to access Copernicus data!
     """
     
+    # Bands whose download links are kept per product
+    _KEY_BANDS = ('B04', 'B08', 'B02', 'B03')  # Red, NIR, Blue, Green
+    
     def __init__(self):
         self.catalog_url = "https://sh.dataspace.copernicus.eu/api/v1/catalog/1.0.0/search"
         self.auth_url = ("https://identity.dataspace.copernicus.eu/auth/realms/"
                         "CDSE/protocol/openid-connect/token")
         self.access_token = None
+        self.expires_at = 0.0
+        self.auth = None
+        
+        # Keep-alive connections shared by auth, catalog search and band downloads
+        self.session = get_session()
+    
+    def _use_token(self, entry: Dict):
+        """Adopt a cached token entry, expiring it 60s early so it never runs out mid-request."""
+        self.access_token = entry['access_token']
+        self.expires_at = entry['expires_at'] - EXPIRY_SLACK_S
+        # Per request, so the shared session (and its identity calls) never carry the token
+        self.auth = BearerAuth(self.access_token)
     
     def authenticate(self, username: str, password: str) -> bool:
-        """Authenticate with Copernicus Data Space."""
+        """
+        Authenticate with Copernicus Data Space.
+        
+        A cached unexpired token is reused without any request; otherwise a
+        cached refresh token is tried before sending the password.
+        """
+        tokens = TokenCache(username=username)
+        cached = tokens.load_valid()
+        if cached:
+            self._use_token(cached)
+            print("✅ Using cached Sentinel Hub token")
+            return True
+        
         try:
             print("🔐 Authenticating with Sentinel Hub...")
             
+            refreshed = tokens.refresh(post=self.session.post)
+            if refreshed:
+                self._use_token(refreshed)
+                print("✅ Sentinel Hub token refreshed!")
+                return True
+            
             auth_data = {
                 'grant_type': 'password', 
                 'username': username,
@@ -35,11 +85,10 @@ class SentinelHubCatalog:
                 'client_id': 'cdse-public'
             }
             
-            response = requests.post(self.auth_url, data=auth_data, timeout=30)
+            response = self.session.post(self.auth_url, data=auth_data, timeout=30)
             
             if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
+                self._use_token(tokens.save(response.json()))
                 print("✅ Sentinel Hub authentication successful!")
                 return True
             else:
@@ -77,102 +126,242 @@ class SentinelHubCatalog:
                 "include": [
                     "id", "properties.datetime", "properties.eo:cloud_cover",
                     "assets", "bbox", "properties.s2:mgrs_tile"
-                ]
+                ],
+                "exclude": ["links"]  # Per-feature links are unused
             }
         }
         
-        try:
-            # Make search request
-            headers = {}
-            if self.access_token:
-                headers['Authorization'] = f'Bearer {self.access_token}'
-            
-            response = requests.post(self.catalog_url, json=search_data,
-                                   headers=headers, timeout=30)
+        return self._run_search(search_data)
+    
+    def search_many(self, bboxes: List[Tuple[float, float, float, float]], start_date: str,
+                    end_date: str, max_cloud_cover: float = 30.0,
+                    per_aoi_limit: int = 10) -> List[List[Dict]]:
+        """
+        Search Sentinel-2 data for several areas with a single catalog request.
+        
+        All bboxes go into one MultiPolygon `intersects` filter; the returned
+        products are split back per bbox with an STRtree over the bboxes.
+        
+        Args:
+            bboxes: Areas as (west, south, east, north)
+            start_date: Start date in 'YYYY-MM-DD' format
+            end_date: End date in 'YYYY-MM-DD' format
+            max_cloud_cover: Maximum cloud cover percentage
+            per_aoi_limit: Expected products per area, used to size each result page
             
-            if response.status_code == 200:
-                data = response.json()
-                features = data.get('features', [])
-                
-                print(f"✅ Found {len(features)} Sentinel-2 products")
+        Returns:
+            One product list per bbox (same order as bboxes), best cloud cover first
+        """
+        print(f"🔍 Searching Sentinel-2 for {len(bboxes)} areas in one request")
+        
+        aois = [box(*bbox) for bbox in bboxes]
+        search_data = {
+            "intersects": MultiPolygon(aois).__geo_interface__,
+            "datetime": f"{start_date}T00:00:00Z/{end_date}T23:59:59Z",
+            "collections": ["sentinel-2-l2a"],
+            "limit": min(100, per_aoi_limit * len(bboxes)),  # Page size; Catalog API maximum is 100
+            "filter": f"eo:cloud_cover <= {max_cloud_cover}",
+            "fields": {
+                "include": [
+                    "id", "properties.datetime", "properties.eo:cloud_cover",
+                    "assets", "bbox", "properties.s2:mgrs_tile"
+                ],
+                "exclude": ["links"]
+            }
+        }
+        
+        # Assign each product to every area its footprint bbox touches
+        tree = STRtree(aois)
+        per_aoi = [[] for _ in bboxes]
+        for product in self._run_search(search_data):
+            if len(product['bbox']) != 4:
+                continue
+            for idx in tree.query(box(*product['bbox']), predicate='intersects'):
+                per_aoi[idx].append(product)
+        
+        return per_aoi
+    
+    def _run_search(self, search_data: Dict) -> List[Dict]:
+        """Run a catalog search and return products sorted by cloud cover (cached briefly)."""
+        # Repeated identical searches within SEARCH_CACHE_TTL_S skip the request
+        search_key = hashlib.sha256(orjson.dumps(search_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        cache_file = SEARCH_CACHE_DIR / f"{search_key}.json"
+        try:
+            if time.time() - cache_file.stat().st_mtime < SEARCH_CACHE_TTL_S:
+                products = orjson.loads(cache_file.read_bytes())
+                print(f"✅ Using {len(products)} cached Sentinel-2 products")
+                return products
+        except (OSError, ValueError):
+            pass
+        
+        try:
+            # The catalog pages results (at most 100 per request); follow the
+            # context.next token until it runs out so no area is left without scenes
+            products = []
+            page_data = search_data
+            while True:
+                # Make search request with the token from authenticate()
+                response = self.session.post(self.catalog_url, json=page_data, timeout=30, stream=True,
+                                             auth=self.auth)
                 
-                # Process results
-                products = []
-                for feature in features:
-                    props = feature.get('properties', {})
-                    assets = feature.get('assets', {})
-                    
-                    # Count available bands
-                    band_count = sum(1 for key in assets.keys() if key.startswith('B'))
-                    
-                    products.append({
-                        'id': feature['id'],
-                        'date': props.get('datetime', '')[:10],
-                        'cloud_cover': props.get('eo:cloud_cover', 0),
-                        'tile': props.get('s2:mgrs_tile', 'Unknown'),
-                        'bbox': feature.get('bbox', []),
-                        'bands_available': band_count,
-                        'assets': list(assets.keys())[:5],  # First 5 asset names
-                        'download_links': self._extract_download_links(assets)
-                    })
+                if response.status_code != 200:
+                    print(f"❌ Search failed: {response.status_code}")
+                    print(response.text[:300])
+                    return []
                 
-                # Sort by cloud cover (best first)
-                products.sort(key=lambda x: x['cloud_cover'])
+                page = {}
+                content_length = int(response.headers.get('Content-Length', 0))
                 
-                return products
+                if content_length and content_length < STREAM_PARSE_MIN_BYTES:
+                    body = response.json()
+                    page['next'] = body.get('context', {}).get('next')
+                    products.extend(self._process_feature(feature) for feature in body.get('features', []))
+                else:
+                    # Large result sets: build each small product dict while the
+                    # features arrive instead of holding the whole response
+                    response.raw.decode_content = True
+                    products.extend(self._process_feature(feature)
+                                    for feature in self._stream_features(response.raw, page))
+                response.close()
                 
-            else:
-                print(f"❌ Search failed: {response.status_code}")
-                print(response.text[:300])
-                return []
+                if page.get('next') is None:
+                    break
+                page_data = {**search_data, 'next': page['next']}
+            
+            print(f"✅ Found {len(products)} Sentinel-2 products")
+            
+            # Sort by cloud cover (best first)
+            products.sort(key=lambda x: x['cloud_cover'])
+            
+            SEARCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_file.write_bytes(orjson.dumps(products))
+            
+            return products
                 
         except Exception as e:
             print(f"❌ Search error: {e}")
             return []
     
-    def _extract_download_links(self, assets: Dict) -> Dict:
-        """Extract download links for key bands."""
-        key_bands = ['B04', 'B08', 'B02', 'B03']  # Red, NIR, Blue, Green
+    @staticmethod
+    def _stream_features(stream, page: Dict):
+        """Yield features from a streamed search response; stores context.next in page."""
+        builder = None
+        for prefix, event, value in ijson.parse(stream, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == 'features.item' and event == 'end_map':
+                    yield builder.value
+                    builder = None
+            elif prefix == 'features.item' and event == 'start_map':
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix == 'context.next' and event in ('number', 'string'):
+                page['next'] = value
+    
+    def _process_feature(self, feature: Dict) -> Dict:
+        """Reduce a STAC feature to the product fields used downstream."""
+        props = feature.get('properties', {})
+        assets = feature.get('assets', {})
         
-        links = {}
-        for band in key_bands:
-            if band in assets:
-                asset = assets[band]
-                if 'href' in asset:
-                    links[band] = asset['href']
+        # Count available bands
+        band_count = sum(1 for key in assets.keys() if key.startswith('B'))
+        download_links = self._extract_download_links(assets)
         
-        return links
+        return {
+            'id': feature['id'],
+            'date': props.get('datetime', '')[:10],
+            'cloud_cover': props.get('eo:cloud_cover', 0),
+            'tile': props.get('s2:mgrs_tile', 'Unknown'),
+            'bbox': feature.get('bbox', []),
+            'bands_available': band_count,
+            'assets': list(assets.keys())[:5],  # First 5 asset names
+            'download_links': download_links,
+            'ndvi_ready': 'B04' in download_links and 'B08' in download_links
+        }
+    
+    def invalidate_cache(self):
+        """Drop all cached catalog search results."""
+        for cache_file in SEARCH_CACHE_DIR.glob("*.json"):
+            cache_file.unlink(missing_ok=True)
+    
+    def _extract_download_links(self, assets: Dict) -> Dict:
+        """Extract download links for key bands."""
+        return {band: asset['href'] for band in self._KEY_BANDS
+                if (asset := assets.get(band)) and 'href' in asset}
     
     def get_band_data_info(self, product: Dict) -> Dict:
         """Get information about downloading specific bands."""
         if not self.access_token:
             return {'error': 'Authentication required'}
         
+        download_links = product['download_links']
+        
+        # Red and NIR for NDVI; readiness was decided when the product was parsed
         download_info = {
             'product_id': product['id'],
             'date': product['date'],
             'cloud_cover': product['cloud_cover'],
             'tile': product['tile'],
-            'bands_for_ndvi': []
+            'bands_for_ndvi': [
+                {
+                    'band': band,
+                    'name': name,
+                    'download_url': download_links[band],
+                    'auth_required': True
+                }
+                for band, name in (('B04', 'Red'), ('B08', 'NIR')) if band in download_links
+            ],
+            'ndvi_ready': product['ndvi_ready']
         }
         
-        # Check if NDVI bands are available
-        required_bands = ['B04', 'B08']  # Red and NIR for NDVI
-        available_bands = []
+        return download_info
+    
+    def fetch_bands(self, product: Dict, bands: List[str] = None) -> Dict[str, Optional[bytes]]:
+        """
+        Download band assets of a product concurrently.
         
-        for band in required_bands:
-            if band in product['download_links']:
-                available_bands.append({
-                    'band': band,
-                    'name': 'Red' if band == 'B04' else 'NIR',
-                    'download_url': product['download_links'][band],
-                    'auth_required': True
-                })
+        All band GETs are in flight at once, so wall time is bounded by the
+        slowest band instead of the sum of round trips. The worker count is
+        min(SH_BAND_WORKERS (default 8), number of bands).
         
-        download_info['bands_for_ndvi'] = available_bands
-        download_info['ndvi_ready'] = len(available_bands) == 2
+        Args:
+            product: Product from search_sentinel2_dusseldorf
+            bands: Band names to fetch (defaults to all download links)
+            
+        Returns:
+            Dictionary mapping band names to raw asset bytes (None if a download failed),
+            in the order the bands were requested
+        """
+        if bands is None:
+            bands = list(product['download_links'])
         
-        return download_info
+        jobs = [(band, product['download_links'][band]) for band in bands
+                if band in product['download_links']]
+        if not jobs:
+            return {}
+        
+        max_workers = min(int(os.getenv('SH_BAND_WORKERS', '8')), len(jobs))
+        results = [None] * len(jobs)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Non-streaming GETs, so each body is read inside its worker thread
+            future_to_idx = {
+                executor.submit(self.session.get, href, timeout=60, auth=self.auth): idx
+                for idx, (_, href) in enumerate(jobs)
+            }
+            for future in as_completed(future_to_idx):
+                idx = future_to_idx[future]
+                band = jobs[idx][0]
+                try:
+                    response = future.result()
+                    if response.status_code == 200:
+                        results[idx] = response.content
+                    else:
+                        print(f"❌ Failed to download {band}: {response.status_code}")
+                except Exception as e:
+                    print(f"❌ Error downloading {band}: {e}")
+        
+        return {band: data for (band, _), data in zip(jobs, results)}
 
 
 def test_sentinel_hub_api():
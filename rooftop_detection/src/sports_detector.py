@@ -15,16 +15,37 @@ import numpy as np
 import rasterio
 from rasterio.mask import mask
 import geopandas as gpd
-from shapely.geometry import box, Polygon
+from shapely.geometry import box
 import requests
 from datetime import datetime, timedelta
 import json
+import orjson
 from typing import List, Tuple, Dict, Optional
 import cv2
 from sklearn.cluster import DBSCAN
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
 import folium
+from numba import njit, prange
+from sentinel_http import BearerAuth, get_session
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _ndvi_veg(nir, red, ndvi_out, mask_out):
+    """NDVI and the uint8 vegetation mask (0.3 < NDVI < 0.9 -> 255) in one pass over the pixels."""
+    for i in prange(nir.shape[0]):
+        for j in range(nir.shape[1]):
+            n = nir[i, j]
+            r = red[i, j]
+            d = n + r
+            v = (n - r) / d if d != 0 else 0.0
+            ndvi_out[i, j] = v
+            mask_out[i, j] = 255 if 0.3 < v < 0.9 else 0
+
+
+# Process API tiles are requested at a fixed 512x512 (see get_sentinel2_data)
+TILE_SIZE = 512
+
 
 class SentinelSportsDetector:
     """
@@ -48,6 +69,8 @@ class SentinelSportsDetector:
         self.token = copernicus_token
         self.base_url = "https://sh.dataspace.copernicus.eu"
         self.session = self._setup_session()
+        # Sent per request (auth=self.auth) so the shared session never carries this token
+        self.auth = BearerAuth(copernicus_token)
         
         # Sports field characteristics for detection
         self.field_specs = {
@@ -70,15 +93,18 @@ class SentinelSportsDetector:
                 'expected_ndvi': (0.5, 0.8)  # Inner grass field
             }
         }
+        
+        # Field specs as arrays (one row per type) so candidates are scored against all types at once;
+        # columns: min_area, max_area, aspect_lo, aspect_hi, ndvi_lo, ndvi_hi
+        self._spec_names = list(self.field_specs.keys())
+        self._spec_arr = np.array([
+            [s['min_area'], s['max_area'], *s['aspect_ratio_range'], *s['expected_ndvi']]
+            for s in self.field_specs.values()
+        ], dtype=np.float32)
     
     def _setup_session(self) -> requests.Session:
-        """Setup authenticated session for Copernicus API."""
-        session = requests.Session()
-        session.headers.update({
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json'
-        })
-        return session
+        """Setup session for Copernicus API (the shared pooled session, left unmodified)."""
+        return get_session()
     
     def get_sentinel2_data(self, 
                           bbox: Tuple[float, float, float, float],
@@ -142,8 +168,8 @@ class SentinelSportsDetector:
                 }]
             },
             "output": {
-                "width": 512,
-                "height": 512,
+                "width": TILE_SIZE,
+                "height": TILE_SIZE,
                 "responses": [{
                     "identifier": "default",
                     "format": {"type": "image/tiff"}
@@ -165,34 +191,43 @@ class SentinelSportsDetector:
         Returns:
             Dictionary containing processed bands and indices
         """
-        blue, green, red, nir, scl = image_data[..., 0], image_data[..., 1], \
-                                     image_data[..., 2], image_data[..., 3], image_data[..., 4]
-        
-        # Convert to reflectance values (0-1)
-        blue = blue / 10000.0
-        green = green / 10000.0
-        red = red / 10000.0
-        nir = nir / 10000.0
-        
-        # Calculate vegetation indices
-        ndvi = np.divide(nir - red, nir + red, 
-                        out=np.zeros_like(nir), where=(nir + red) != 0)
-        
-        # Enhanced Vegetation Index
-        evi = 2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1)
-        
-        # Create cloud mask (SCL values: 8,9,10 = clouds, 11 = snow)
-        cloud_mask = np.isin(scl, [8, 9, 10, 11])
-        
-        # True color composite for visualization
-        rgb = np.stack([red, green, blue], axis=2)
-        rgb = np.clip(rgb * 2.5, 0, 1)  # Enhance brightness
+        # Convert to float32 reflectance values (0-1) in one pass
+        refl = image_data[..., :4].astype(np.float32)
+        refl *= np.float32(1e-4)
+        blue, green, red, nir = refl[..., 0], refl[..., 1], refl[..., 2], refl[..., 3]
+        scl = image_data[..., 4].astype(np.uint8)  # Scene classes 0-11 fit in a byte
+        
+        # Calculate NDVI and the vegetation mask used for field detection in one kernel
+        ndvi = np.empty(nir.shape, dtype=np.float32)
+        vegetation_mask = np.empty(nir.shape, dtype=np.uint8)
+        _ndvi_veg(nir, red, ndvi, vegetation_mask)
+        
+        # Enhanced Vegetation Index: 2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)
+        evi_denom = np.multiply(red, np.float32(6))
+        evi_denom += nir
+        evi_denom -= np.float32(7.5) * blue
+        evi_denom += np.float32(1)
+        evi = np.subtract(nir, red)
+        evi *= np.float32(2.5)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(evi, evi_denom, out=evi)
+        
+        # Create cloud mask (SCL values: 8,9,10 = clouds, 11 = snow); on uint8 the
+        # range test is one wrapping subtract and one compare
+        cloud_mask = (scl - np.uint8(8)) <= 3
+        
+        # True color composite for visualization, brightened while each band is written
+        rgb = np.empty(red.shape + (3,), dtype=np.float32)
+        for channel, band in enumerate((red, green, blue)):
+            np.multiply(band, np.float32(2.5), out=rgb[..., channel])  # Enhance brightness
+        np.clip(rgb, 0, 1, out=rgb)
         
         return {
             'rgb': rgb,
             'ndvi': ndvi,
             'evi': evi,
             'cloud_mask': cloud_mask,
+            'vegetation_mask': vegetation_mask,
             'red': red,
             'green': green,
             'blue': blue,
@@ -202,7 +237,8 @@ class SentinelSportsDetector:
     def detect_rectangular_objects(self, 
                                  ndvi: np.ndarray,
                                  min_area: int = 1000,
-                                 max_area: int = 50000) -> List[Dict]:
+                                 max_area: int = 50000,
+                                 vegetation_mask: Optional[np.ndarray] = None) -> List[Dict]:
         """
         Detect rectangular objects that could be sports fields.
         
@@ -210,22 +246,48 @@ class SentinelSportsDetector:
             ndvi: NDVI image array
             min_area: Minimum area in pixels
             max_area: Maximum area in pixels
+            vegetation_mask: Precomputed uint8 vegetation mask from preprocess_image
+                (derived from ndvi if not given)
             
         Returns:
             List of detected rectangular objects with properties
         """
-        # Threshold NDVI to identify vegetation
-        vegetation_mask = (ndvi > 0.3) & (ndvi < 0.9)
-        
-        # Convert to uint8 for OpenCV
-        mask_uint8 = (vegetation_mask * 255).astype(np.uint8)
-        
-        # Find contours
-        contours, _ = cv2.findContours(mask_uint8, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if vegetation_mask is not None:
+            mask_uint8 = vegetation_mask
+        else:
+            # Threshold NDVI to identify vegetation, as uint8 for OpenCV
+            mask_uint8 = (((ndvi > 0.3) & (ndvi < 0.9)) * 255).astype(np.uint8)
+        
+        # Label vegetation blobs; areas and bounding boxes come from one pass
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask_uint8, connectivity=8)
+        counts = stats[:, cv2.CC_STAT_AREA]
+        
+        # Mean NDVI of every blob at once instead of a full-image fillPoly per contour
+        ndvi_sums = np.bincount(labels.ravel(), weights=ndvi.ravel().astype(np.float32), minlength=num_labels)
+        blob_ndvi = ndvi_sums / np.maximum(counts, 1)
+        
+        # A rectangle's bounding-box aspect ratio never exceeds its true one, so blobs
+        # whose box is already longer than every field type can be skipped before tracing
+        widths = stats[:, cv2.CC_STAT_WIDTH]
+        heights = stats[:, cv2.CC_STAT_HEIGHT]
+        bbox_aspect = np.maximum(widths, heights) / np.maximum(np.minimum(widths, heights), 1)
+        
+        # Label 0 is the background
+        candidates = np.flatnonzero((counts >= min_area) & (counts <= max_area) &
+                                    (bbox_aspect <= self._spec_arr[:, 3].max()))
+        candidates = candidates[candidates != 0]
         
         detected_objects = []
         
-        for contour in contours:
+        for label in candidates:
+            # Trace the blob outline inside its bounding box only
+            x, y = stats[label, cv2.CC_STAT_LEFT], stats[label, cv2.CC_STAT_TOP]
+            w, h = stats[label, cv2.CC_STAT_WIDTH], stats[label, cv2.CC_STAT_HEIGHT]
+            blob = (labels[y:y+h, x:x+w] == label).astype(np.uint8)
+            contours, _ = cv2.findContours(blob, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                           offset=(int(x), int(y)))
+            contour = max(contours, key=cv2.contourArea)
+            
             # Calculate area
             area = cv2.contourArea(contour)
             
@@ -243,10 +305,7 @@ class SentinelSportsDetector:
                     # Calculate aspect ratio
                     aspect_ratio = max(width, height) / min(width, height) if min(width, height) > 0 else 0
                     
-                    # Get average NDVI within the contour
-                    mask = np.zeros(ndvi.shape, dtype=np.uint8)
-                    cv2.fillPoly(mask, [contour], 255)
-                    avg_ndvi = np.mean(ndvi[mask > 0])
+                    avg_ndvi = float(blob_ndvi[label])
                     
                     detected_objects.append({
                         'contour': contour,
@@ -255,32 +314,51 @@ class SentinelSportsDetector:
                         'angle': angle,
                         'area': area,
                         'aspect_ratio': aspect_ratio,
-                        'avg_ndvi': avg_ndvi,
-                        'confidence': self._calculate_confidence(area, aspect_ratio, avg_ndvi)
+                        'avg_ndvi': avg_ndvi
                     })
         
+        # Score all candidates in one vectorized call
+        if detected_objects:
+            confidences = self._calculate_confidence(
+                np.array([obj['area'] for obj in detected_objects]),
+                np.array([obj['aspect_ratio'] for obj in detected_objects]),
+                np.array([obj['avg_ndvi'] for obj in detected_objects])
+            )
+            for obj, confidence in zip(detected_objects, confidences):
+                obj['confidence'] = float(confidence)
+        
         return detected_objects
     
-    def _calculate_confidence(self, area: float, aspect_ratio: float, avg_ndvi: float) -> float:
-        """Calculate confidence score for detected object being a sports field."""
-        confidence = 0.0
+    def _spec_matches(self, area: np.ndarray, aspect_ratio: np.ndarray) -> np.ndarray:
+        """(N, K) mask of candidates whose area and aspect ratio fit each field type."""
+        spec = self._spec_arr
+        area = area[:, None]
+        aspect_ratio = aspect_ratio[:, None]
+        return ((spec[:, 0] <= area) & (area <= spec[:, 1]) &
+                (spec[:, 2] <= aspect_ratio) & (aspect_ratio <= spec[:, 3]))
+    
+    def _calculate_confidence(self, area, aspect_ratio, avg_ndvi) -> np.ndarray:
+        """
+        Calculate confidence scores for detected objects being sports fields.
+        
+        Takes scalars or equal-length arrays and returns an array of scores.
+        """
+        area = np.atleast_1d(np.asarray(area, dtype=np.float32))
+        aspect_ratio = np.atleast_1d(np.asarray(aspect_ratio, dtype=np.float32))
+        avg_ndvi = np.atleast_1d(np.asarray(avg_ndvi, dtype=np.float32))
         
         # Check against known sports field specifications
-        for field_type, specs in self.field_specs.items():
-            if (specs['min_area'] <= area <= specs['max_area'] and
-                specs['aspect_ratio_range'][0] <= aspect_ratio <= specs['aspect_ratio_range'][1] and
-                specs['expected_ndvi'][0] <= avg_ndvi <= specs['expected_ndvi'][1]):
-                confidence = max(confidence, 0.8)
-                break
+        spec = self._spec_arr
+        ndvi = avg_ndvi[:, None]
+        fits_spec = (self._spec_matches(area, aspect_ratio) &
+                     (spec[:, 4] <= ndvi) & (ndvi <= spec[:, 5])).any(axis=1)
+        confidence = np.where(fits_spec, 0.8, 0.0)
         
         # Additional confidence factors
-        if 0.5 <= avg_ndvi <= 0.8:  # Good vegetation health
-            confidence += 0.1
-            
-        if 1.3 <= aspect_ratio <= 2.5:  # Typical sports field ratios
-            confidence += 0.1
-            
-        return min(confidence, 1.0)
+        confidence += np.where((0.5 <= avg_ndvi) & (avg_ndvi <= 0.8), 0.1, 0.0)  # Good vegetation health
+        confidence += np.where((1.3 <= aspect_ratio) & (aspect_ratio <= 2.5), 0.1, 0.0)  # Typical sports field ratios
+        
+        return np.minimum(confidence, 1.0)
     
     def classify_sports_fields(self, detected_objects: List[Dict]) -> List[Dict]:
         """
@@ -292,37 +370,29 @@ class SentinelSportsDetector:
         Returns:
             List of classified sports fields with type predictions
         """
-        classified_fields = []
+        candidates = [obj for obj in detected_objects if obj['confidence'] >= 0.5]
+        if not candidates:
+            return []
         
-        for obj in detected_objects:
-            if obj['confidence'] < 0.5:
-                continue
-                
-            area = obj['area']
-            aspect_ratio = obj['aspect_ratio']
-            avg_ndvi = obj['avg_ndvi']
-            
-            # Classify based on specifications
-            field_type = 'unknown'
-            type_confidence = 0.0
-            
-            for ftype, specs in self.field_specs.items():
-                if (specs['min_area'] <= area <= specs['max_area'] and
-                    specs['aspect_ratio_range'][0] <= aspect_ratio <= specs['aspect_ratio_range'][1]):
-                    
-                    # Calculate type-specific confidence
-                    ndvi_match = 1.0 - abs(avg_ndvi - np.mean(specs['expected_ndvi'])) / 0.3
-                    area_match = 1.0 - abs(area - np.mean([specs['min_area'], specs['max_area']])) / specs['max_area']
-                    
-                    current_confidence = (ndvi_match + area_match) / 2
-                    
-                    if current_confidence > type_confidence:
-                        field_type = ftype
-                        type_confidence = current_confidence
-            
+        area = np.array([obj['area'] for obj in candidates], dtype=np.float32)
+        aspect_ratio = np.array([obj['aspect_ratio'] for obj in candidates], dtype=np.float32)
+        avg_ndvi = np.array([obj['avg_ndvi'] for obj in candidates], dtype=np.float32)
+        
+        # Type-specific confidence for every (candidate, field type) pair
+        spec = self._spec_arr
+        ndvi_match = 1.0 - np.abs(avg_ndvi[:, None] - (spec[:, 4] + spec[:, 5]) / 2) / 0.3
+        area_match = 1.0 - np.abs(area[:, None] - (spec[:, 0] + spec[:, 1]) / 2) / spec[:, 1]
+        type_scores = np.where(self._spec_matches(area, aspect_ratio),
+                               (ndvi_match + area_match) / 2, -np.inf)
+        
+        best_type = type_scores.argmax(axis=1)
+        best_score = type_scores[np.arange(len(candidates)), best_type]
+        
+        classified_fields = []
+        for obj, type_idx, type_confidence in zip(candidates, best_type, best_score):
             if type_confidence > 0.6:  # Only include confident classifications
-                obj['field_type'] = field_type
-                obj['type_confidence'] = type_confidence
+                obj['field_type'] = self._spec_names[type_idx]
+                obj['type_confidence'] = float(type_confidence)
                 classified_fields.append(obj)
         
         return classified_fields
@@ -345,7 +415,7 @@ class SentinelSportsDetector:
             Folium map object with sports field markers
         """
         # Create base map
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=zoom)
+        m = folium.Map(location=[center_lat, center_lon], zoom_start=zoom, prefer_canvas=True)
         
         # Color mapping for different field types
         colors = {
@@ -355,26 +425,39 @@ class SentinelSportsDetector:
             'unknown': 'gray'
         }
         
+        # All fields as a single FeatureCollection instead of one marker object each
+        features = []
         for field in classified_fields:
             # Convert pixel coordinates to lat/lon (this would need proper georeference)
             # For demo purposes, using approximate conversion
             lat = center_lat + (field['center'][1] - 256) * 0.0001
             lon = center_lon + (field['center'][0] - 256) * 0.0001
             
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=8,
-                popup=f"""
-                <b>{field['field_type'].replace('_', ' ').title()}</b><br>
-                Area: {field['area']:.0f} pixels<br>
-                Confidence: {field['confidence']:.2f}<br>
-                NDVI: {field['avg_ndvi']:.2f}<br>
-                Aspect Ratio: {field['aspect_ratio']:.1f}
-                """,
-                color=colors.get(field['field_type'], 'gray'),
-                fillColor=colors.get(field['field_type'], 'gray'),
-                fillOpacity=0.7
-            ).add_to(m)
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': {
+                    'field_type': field['field_type'].replace('_', ' ').title(),
+                    'color': colors.get(field['field_type'], 'gray'),
+                    'area': round(float(field['area'])),
+                    'confidence': round(float(field['confidence']), 2),
+                    'ndvi': round(float(field['avg_ndvi']), 2),
+                    'aspect_ratio': round(float(field['aspect_ratio']), 1)
+                }
+            })
+        
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            marker=folium.CircleMarker(radius=8, fill=True, fill_opacity=0.7),
+            style_function=lambda feature: {
+                'color': feature['properties']['color'],
+                'fillColor': feature['properties']['color']
+            },
+            popup=folium.GeoJsonPopup(
+                fields=['field_type', 'area', 'confidence', 'ndvi', 'aspect_ratio'],
+                aliases=['Type', 'Area (pixels)', 'Confidence', 'NDVI', 'Aspect Ratio']
+            )
+        ).add_to(m)
         
         return m
     
@@ -391,13 +474,14 @@ class SentinelSportsDetector:
         for field in classified_fields:
             # Convert contour to polygon (simplified)
             # In practice, you'd need proper coordinate transformation
-            coords = [(float(point[0][0]), float(point[0][1])) for point in field['contour']]
+            coords = field['contour'].reshape(-1, 2)
             if len(coords) >= 3:
-                polygon = Polygon(coords)
+                # Closed ring kept as a NumPy array; orjson serializes it directly
+                ring = np.vstack([coords, coords[:1]])
                 
                 feature = {
                     "type": "Feature",
-                    "geometry": polygon.__geo_interface__,
+                    "geometry": {"type": "Polygon", "coordinates": [ring]},
                     "properties": {
                         "field_type": field['field_type'],
                         "area": field['area'],
@@ -414,8 +498,8 @@ class SentinelSportsDetector:
             "features": features
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(geojson, f, indent=2)
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(geojson, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
         
         print(f"Exported {len(features)} sports fields to {output_file}")
     
@@ -2,86 +2,157 @@
 Expanded OSM query to find actual calisthenics parks in Düsseldorf.
 """
 
+import hashlib
+import re
+import time
+import orjson
 import requests
+from functools import lru_cache
+from pathlib import Path
 
-def expanded_calisthenics_search():
-    """Search for calisthenics parks with broader query."""
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+
+# Tag values that hint at calisthenics equipment
+KW_RE = re.compile(r"pull|bar|fitness|calisthenics|workout", re.IGNORECASE)
+
+# Value regexes of COMBINED_QUERY; Overpass "~" is an unanchored, case-sensitive search
+SPORT_RE = re.compile(r"fitness|calisthenics")
+FITNESS_RE = re.compile(r"pull.*up|bar|calisthenics")
+PARK_NAME_RE = re.compile(r"Volksgarten|Flora|Bahnhof")
+
+# Raw Overpass responses, keyed by query hash
+OVERPASS_CACHE_DIR = Path.home() / '.cache' / 'social-sports' / 'overpass'
+
+# Abort downloads beyond this size instead of filling memory/disk
+OVERPASS_MAX_BYTES = 32 * 1024 * 1024
+
+# Calisthenics candidates and the known parks in one request; split client-side
+COMBINED_QUERY = """
+[out:json][timeout:25];
+area["name"="Düsseldorf"]["admin_level"="6"]->.searchArea;
+(
+  // Fitness stations
+  nwr["leisure"="fitness_station"](area.searchArea);
+  
+  // Sports centres with fitness
+  nwr["leisure"="sports_centre"]["sport"~"fitness|calisthenics"](area.searchArea);
+  
+  // Playgrounds with fitness equipment
+  nwr["leisure"="playground"]["fitness"](area.searchArea);
+  
+  // Generic fitness amenities
+  nwr["amenity"="fitness"](area.searchArea);
+  
+  // Anything tagged with calisthenics
+  nwr["sport"="calisthenics"](area.searchArea);
+  
+  // Street workout areas
+  nwr["fitness"~"pull.*up|bar|calisthenics"](area.searchArea);
+  
+  // Known parks
+  wr["leisure"="park"]["name"~"Volksgarten|Flora|Bahnhof"](area.searchArea);
+);
+out center;
+"""
+
+def _is_fitness_match(tags: dict) -> bool:
+    """Whether an element matched one of the fitness clauses of COMBINED_QUERY."""
+    leisure = tags.get('leisure')
+    return (leisure == 'fitness_station' or
+            (leisure == 'sports_centre' and bool(SPORT_RE.search(tags.get('sport', '')))) or
+            (leisure == 'playground' and 'fitness' in tags) or
+            tags.get('amenity') == 'fitness' or
+            tags.get('sport') == 'calisthenics' or
+            bool(FITNESS_RE.search(tags.get('fitness', ''))))
+
+def _is_park_match(element: dict) -> bool:
+    """Whether an element matched the known-parks clause of COMBINED_QUERY."""
+    tags = element.get('tags', {})
+    return (element['type'] != 'node' and tags.get('leisure') == 'park' and
+            bool(PARK_NAME_RE.search(tags.get('name', ''))))
+
+def cached_overpass(query: str, ttl: int = 86400) -> dict:
+    """Post an Overpass query, reusing a cached response younger than ttl seconds."""
+    key = hashlib.sha256(f"{OVERPASS_URL}\n{query}".encode()).hexdigest()
+    cache_file = OVERPASS_CACHE_DIR / f"{key}.json"
     
-    overpass_url = "http://overpass-api.de/api/interpreter"
+    if cache_file.exists() and time.time() - cache_file.stat().st_mtime < ttl:
+        return orjson.loads(cache_file.read_bytes())
+    
+    # Stream the body straight into the cache file rather than buffering it in the response
+    OVERPASS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix('.part')
+    with requests.post(OVERPASS_URL, data=query, timeout=30, stream=True,
+                       headers={'Accept-Encoding': 'gzip, deflate, br'}) as response:
+        response.raise_for_status()
+        size = 0
+        with open(tmp_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > OVERPASS_MAX_BYTES:
+                    f.close()
+                    tmp_file.unlink()
+                    raise ValueError(f"Overpass response exceeds {OVERPASS_MAX_BYTES // (1024 * 1024)} MB")
+                f.write(chunk)
+    tmp_file.replace(cache_file)
+    
+    return orjson.loads(cache_file.read_bytes())
+
+@lru_cache(maxsize=1)
+def fetch_osm_elements():
+    """
+    Run COMBINED_QUERY once per process (and at most once a day via the disk cache).
     
-    # Much broader query including playgrounds and sports areas
-    query = """
-    [out:json][timeout:25];
-    (
-      area["name"="Düsseldorf"]["admin_level"="6"];
-    )->.searchArea;
-    (
-      // Fitness stations
-      node["leisure"="fitness_station"](area.searchArea);
-      way["leisure"="fitness_station"](area.searchArea);
-      
-      // Sports centres with fitness
-      node["leisure"="sports_centre"]["sport"~"fitness|calisthenics"](area.searchArea);
-      way["leisure"="sports_centre"]["sport"~"fitness|calisthenics"](area.searchArea);
-      
-      // Playgrounds with fitness equipment
-      node["leisure"="playground"]["fitness"](area.searchArea);
-      way["leisure"="playground"]["fitness"](area.searchArea);
-      
-      // Generic fitness amenities
-      node["amenity"="fitness"](area.searchArea);
-      way["amenity"="fitness"](area.searchArea);
-      
-      // Anything tagged with calisthenics
-      node["sport"="calisthenics"](area.searchArea);
-      way["sport"="calisthenics"](area.searchArea);
-      
-      // Street workout areas
-      node["fitness"~"pull.*up|bar|calisthenics"](area.searchArea);
-      way["fitness"~"pull.*up|bar|calisthenics"](area.searchArea);
-    );
-    out center meta;
+    Returns:
+        Tuple of (fitness elements, park elements)
     """
+    fitness_elements, park_elements = [], []
+    for element in cached_overpass(COMBINED_QUERY)['elements']:
+        if _is_park_match(element):
+            park_elements.append(element)
+        if _is_fitness_match(element.get('tags', {})):
+            fitness_elements.append(element)
+    
+    return fitness_elements, park_elements
+
+def expanded_calisthenics_search():
+    """Search for calisthenics parks with broader query."""
     
     try:
         print("🔍 Erweiterte OSM-Suche für Calisthenics...")
-        response = requests.post(overpass_url, data=query, timeout=30)
+        elements, _ = fetch_osm_elements()
+        
+        print(f"✅ Gefunden: {len(elements)} Objekte")
         
-        if response.status_code == 200:
-            data = response.json()
+        # Analyze results
+        for i, element in enumerate(elements[:10], 1):
+            tags = element.get('tags', {})
+            
+            # Get coordinates
+            if element['type'] == 'node':
+                lat, lon = element['lat'], element['lon']
+            elif 'center' in element:
+                lat, lon = element['center']['lat'], element['center']['lon']
+            else:
+                lat, lon = 'N/A', 'N/A'
             
-            print(f"✅ Gefunden: {len(data['elements'])} Objekte")
+            print(f"\n{i}. OSM {element['type']}/{element['id']}")
+            print(f"   📍 Koordinaten: {lat}, {lon}")
+            print(f"   🏷️ Name: {tags.get('name', 'Unbekannt')}")
+            print(f"   🏋️ Leisure: {tags.get('leisure')}")
+            print(f"   ⚽ Sport: {tags.get('sport')}")
+            print(f"   💪 Fitness: {tags.get('fitness')}")
             
-            # Analyze results
-            for i, element in enumerate(data['elements'][:10], 1):
-                tags = element.get('tags', {})
-                
-                # Get coordinates
-                if element['type'] == 'node':
-                    lat, lon = element['lat'], element['lon']
-                elif 'center' in element:
-                    lat, lon = element['center']['lat'], element['center']['lon']
-                else:
-                    lat, lon = 'N/A', 'N/A'
-                
-                print(f"\n{i}. OSM {element['type']}/{element['id']}")
-                print(f"   📍 Koordinaten: {lat}, {lon}")
-                print(f"   🏷️ Name: {tags.get('name', 'Unbekannt')}")
-                print(f"   🏋️ Leisure: {tags.get('leisure')}")
-                print(f"   ⚽ Sport: {tags.get('sport')}")
-                print(f"   💪 Fitness: {tags.get('fitness')}")
-                
-                # Check for calisthenics keywords
-                relevant_tags = []
-                for key, value in tags.items():
-                    if any(word in str(value).lower() for word in ['pull', 'bar', 'fitness', 'calisthenics', 'workout']):
-                        relevant_tags.append(f"{key}={value}")
-                
-                if relevant_tags:
-                    print(f"   🎯 Relevante Tags: {', '.join(relevant_tags[:3])}")
-                    
-        else:
-            print(f"❌ OSM Fehler: {response.status_code}")
+            # Check for calisthenics keywords (only the first 3 are shown)
+            relevant_tags = []
+            for key, value in tags.items():
+                if KW_RE.search(str(value)):
+                    relevant_tags.append(f"{key}={value}")
+                    if len(relevant_tags) == 3:
+                        break
+            
+            if relevant_tags:
+                print(f"   🎯 Relevante Tags: {', '.join(relevant_tags)}")
             
     except Exception as e:
         print(f"❌ Abfrage fehlgeschlagen: {e}")
@@ -89,38 +160,17 @@ def expanded_calisthenics_search():
 def search_parks_with_fitness():
     """Search for parks that might contain fitness equipment."""
     
-    overpass_url = "http://overpass-api.de/api/interpreter"
-    
-    query = """
-    [out:json][timeout:25];
-    (
-      area["name"="Düsseldorf"]["admin_level"="6"];
-    )->.searchArea;
-    (
-      // All parks in Düsseldorf
-      way["leisure"="park"]["name"~"Volksgarten|Flora|Bahnhof"](area.searchArea);
-      relation["leisure"="park"]["name"~"Volksgarten|Flora|Bahnhof"](area.searchArea);
-    );
-    out center;
-    """
-    
     try:
         print("\n🌳 Suche nach bekannten Parks...")
-        response = requests.post(overpass_url, data=query, timeout=30)
+        _, parks = fetch_osm_elements()
         
-        if response.status_code == 200:
-            data = response.json()
-            
-            print(f"✅ Parks gefunden: {len(data['elements'])}")
-            
-            for element in data['elements']:
-                tags = element.get('tags', {})
-                if 'center' in element:
-                    lat, lon = element['center']['lat'], element['center']['lon']
-                    print(f"   🌲 {tags.get('name')}: {lat:.4f}, {lon:.4f}")
-                    
-        else:
-            print(f"❌ Parks-Suche Fehler: {response.status_code}")
+        print(f"✅ Parks gefunden: {len(parks)}")
+        
+        for element in parks:
+            tags = element.get('tags', {})
+            if 'center' in element:
+                lat, lon = element['center']['lat'], element['center']['lon']
+                print(f"   🌲 {tags.get('name')}: {lat:.4f}, {lon:.4f}")
             
     except Exception as e:
         print(f"❌ Parks-Abfrage fehlgeschlagen: {e}")
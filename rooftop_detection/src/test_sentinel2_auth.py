@@ -5,10 +5,19 @@ Simple Sentinel-2 Test WITHOUT Rasterio Dependencies
 Test authentication and product search first, before adding complex dependencies.
 """
 
+import shutil
+import struct
+import time
+import zlib
 import requests
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import orjson
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Dict, List, Tuple
+from sentinel_http import BearerAuth, get_session
+from token_cache import TokenCache, get_credentials
 
 
 class SimpleSentinel2Access:
@@ -17,9 +26,22 @@ class SimpleSentinel2Access:
     def __init__(self):
         self.api_base = "https://catalogue.dataspace.copernicus.eu"
         self.access_token = None
+        self.auth = None
+        self._tokens = TokenCache()
+        
+        # Shared keep-alive connection pool for auth, search and product calls
+        self.session = get_session()
     
     def authenticate(self, username: str, password: str) -> bool:
         """Authenticate with Copernicus Data Space Ecosystem."""
+        # Reuse a cached token, or refresh it, before sending the password
+        cached = self._tokens.load_valid() or self._tokens.refresh(post=self.session.post)
+        if cached:
+            self.access_token = cached['access_token']
+            self.auth = BearerAuth(self.access_token)
+            print(f"✅ Using cached token (expires in {cached['expires_at'] - time.time():.0f} seconds)")
+            return True
+        
         try:
             print(f"🔐 Authenticating user: {username}")
             
@@ -33,11 +55,13 @@ class SimpleSentinel2Access:
                 'client_id': 'cdse-public'
             }
             
-            response = requests.post(auth_url, data=auth_data, timeout=30)
+            response = self.session.post(auth_url, data=auth_data, timeout=30)
             
             if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
+                token_data = orjson.loads(response.content)
+                self._tokens = TokenCache(username=username)
+                self.access_token = self._tokens.save(token_data)['access_token']
+                self.auth = BearerAuth(self.access_token)
                 
                 # Token info
                 expires_in = token_data.get('expires_in', 0)
@@ -91,10 +115,10 @@ class SimpleSentinel2Access:
                 '$select': 'Id,Name,ContentDate,ContentLength,Attributes'
             }
             
-            response = requests.get(search_url, params=params, timeout=30)
+            response = self.session.get(search_url, params=params, timeout=30, auth=self.auth)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 products = data.get('value', [])
                 
                 print(f"✅ Found {len(products)} suitable products")
@@ -127,13 +151,9 @@ class SimpleSentinel2Access:
     
     def _extract_cloud_cover(self, product: Dict) -> float:
         """Extract cloud cover percentage from product."""
-        try:
-            for attr in product.get('Attributes', []):
-                if attr.get('Name') == 'cloudCover':
-                    return round(attr.get('Value', 0), 1)
-            return 0.0
-        except:
-            return 0.0
+        return next((round(attr.get('Value', 0.0), 1)
+                     for attr in product.get('Attributes') or ()
+                     if attr.get('Name') == 'cloudCover'), 0.0)
     
     def get_product_download_info(self, product_id: str) -> Dict:
         """Get download information for a product."""
@@ -144,10 +164,10 @@ class SimpleSentinel2Access:
             # Get product details
             product_url = f"{self.api_base}/odata/v1/Products({product_id})"
             
-            response = requests.get(product_url, timeout=30)
+            response = self.session.get(product_url, timeout=30, auth=self.auth)
             
             if response.status_code == 200:
-                product = response.json()
+                product = orjson.loads(response.content)
                 
                 download_url = f"https://zipper.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
                 
@@ -165,6 +185,162 @@ class SimpleSentinel2Access:
         except Exception as e:
             return {'error': str(e)}
 
+    
+    def _get_range(self, url: str, start: int, end: int) -> bytes:
+        """GET bytes start..end (inclusive) of a remote file."""
+        response = self.session.get(url, headers={'Range': f'bytes={start}-{end}', 'Accept-Encoding': 'identity'}, timeout=60, auth=self.auth)
+        response.raise_for_status()
+        return response.content
+    
+    def _read_zip_directory(self, url: str) -> List[Tuple[str, int, int, int]]:
+        """
+        Read a remote zip's central directory with two small Range requests.
+        
+        Returns:
+            (name, compression method, compressed size, local header offset) per member
+        """
+        # Total size, then the tail holding the end-of-central-directory record
+        head = self.session.get(url, headers={'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'}, timeout=60, auth=self.auth)
+        head.raise_for_status()
+        total_size = int(head.headers['Content-Range'].rsplit('/', 1)[1])
+        
+        tail_start = max(0, total_size - 65536 - 22)
+        tail = self._get_range(url, tail_start, total_size - 1)
+        eocd = tail.rfind(b'PK\x05\x06')
+        if eocd < 0:
+            raise ValueError("End of central directory not found")
+        cd_size, cd_offset = struct.unpack_from('<II', tail, eocd + 12)
+        
+        # ZIP64 archives keep the real offsets in the zip64 end record
+        if cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+            locator = tail.rfind(b'PK\x06\x07', 0, eocd)
+            zip64_offset, = struct.unpack_from('<Q', tail, locator + 8)
+            record = self._get_range(url, zip64_offset, zip64_offset + 55)
+            cd_size, cd_offset = struct.unpack_from('<QQ', record, 40)
+        
+        if cd_offset >= tail_start:
+            directory = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+        else:
+            directory = self._get_range(url, cd_offset, cd_offset + cd_size - 1)
+        
+        members = []
+        pos = 0
+        while pos + 46 <= len(directory) and directory[pos:pos + 4] == b'PK\x01\x02':
+            method, = struct.unpack_from('<H', directory, pos + 10)
+            comp_size, = struct.unpack_from('<I', directory, pos + 20)
+            name_len, extra_len, comment_len = struct.unpack_from('<HHH', directory, pos + 28)
+            local_offset, = struct.unpack_from('<I', directory, pos + 42)
+            name = directory[pos + 46:pos + 46 + name_len].decode('utf-8', 'replace')
+            
+            # ZIP64 extra field holds sizes/offset that overflow 32 bits
+            extra = directory[pos + 46 + name_len:pos + 46 + name_len + extra_len]
+            epos = 0
+            while epos + 4 <= len(extra):
+                tag, size = struct.unpack_from('<HH', extra, epos)
+                if tag == 0x0001:
+                    values = iter(struct.unpack_from(f'<{size // 8}Q', extra, epos + 4))
+                    uncomp_size, = struct.unpack_from('<I', directory, pos + 24)
+                    if uncomp_size == 0xFFFFFFFF:
+                        next(values)
+                    if comp_size == 0xFFFFFFFF:
+                        comp_size = next(values)
+                    if local_offset == 0xFFFFFFFF:
+                        local_offset = next(values)
+                epos += 4 + size
+            
+            members.append((name, method, comp_size, local_offset))
+            pos += 46 + name_len + extra_len + comment_len
+        
+        return members
+    
+    def download_bands(self, product_id: str, bands: Tuple[str, ...] = ("B04", "B08"),
+                       gap: int = 32 * 1024, output_dir: str = "../data/sentinel2_cache") -> Dict[str, Path]:
+        """
+        Download only the given band files out of a product's SAFE zip.
+        
+        The zip's central directory is read with Range requests, the byte ranges
+        of the wanted JP2 members are merged when they lie within `gap` bytes of
+        each other, and only those ranges are transferred.
+        
+        Args:
+            product_id: Product ID from search results
+            bands: Band names (10m JP2 files are preferred over coarser ones)
+            gap: Maximum gap in bytes for merging neighboring ranges
+            output_dir: Directory for the extracted JP2 files
+            
+        Returns:
+            Dictionary mapping band names to the extracted files
+        """
+        if not self.access_token:
+            print("❌ Not authenticated!")
+            return {}
+        
+        url = f"https://zipper.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            members = self._read_zip_directory(url)
+        except (requests.RequestException, ValueError, KeyError, struct.error) as e:
+            print(f"❌ Could not read product index: {e}")
+            return {}
+        
+        # One member per band, preferring the 10m resolution file
+        wanted = {}
+        for name, method, comp_size, offset in members:
+            for band in bands:
+                if name.endswith(f"_{band}_10m.jp2") or (name.endswith(f"_{band}.jp2") and band not in wanted):
+                    wanted[band] = (name, method, comp_size, offset)
+        
+        # Member ranges (local header + data, with slack for the local extra field), merged by gap
+        spans = sorted((offset, offset + 30 + len(name.encode()) + 1024 + comp_size, band)
+                       for band, (name, method, comp_size, offset) in wanted.items())
+        merged = []
+        for start, end, band in spans:
+            if merged and start - merged[-1][1] <= gap:
+                merged[-1][1] = max(merged[-1][1], end)
+                merged[-1][2].append(band)
+            else:
+                merged.append([start, end, [band]])
+        
+        downloaded = {}
+        for start, end, range_bands in merged:
+            part_file = output_dir / f"{product_id}_{start}.part"
+            range_headers = {'Range': f'bytes={start}-{end - 1}', 'Accept-Encoding': 'identity'}
+            with self.session.get(url, headers=range_headers, stream=True, timeout=120, auth=self.auth) as response:
+                if response.status_code != 206:
+                    print(f"❌ Range request failed: {response.status_code}")
+                    continue
+                with open(part_file, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1 << 20)
+            
+            # Cut each member's data out of the downloaded range
+            with open(part_file, 'rb') as part:
+                for band in range_bands:
+                    name, method, comp_size, offset = wanted[band]
+                    part.seek(offset - start)
+                    local_header = part.read(30)
+                    name_len, extra_len = struct.unpack_from('<HH', local_header, 26)
+                    part.seek(offset - start + 30 + name_len + extra_len)
+                    
+                    band_file = output_dir / f"{product_id}_{band}.jp2"
+                    with open(band_file, 'wb') as out:
+                        if method == 0:
+                            remaining = comp_size
+                            while remaining:
+                                chunk = part.read(min(1 << 20, remaining))
+                                if not chunk:
+                                    break
+                                out.write(chunk)
+                                remaining -= len(chunk)
+                        else:
+                            out.write(zlib.decompressobj(-15).decompress(part.read(comp_size)))
+                    
+                    downloaded[band] = band_file
+                    print(f"✅ Downloaded {band}: {comp_size / 1024 / 1024:.1f} MB")
+            part_file.unlink()
+        
+        return downloaded
 
 def test_real_sentinel2_access():
     """Interactive test for real Sentinel-2 access."""
@@ -173,14 +349,14 @@ def test_real_sentinel2_access():
     
     s2 = SimpleSentinel2Access()
     
-    # Get credentials
-    print("\n📝 Enter your Copernicus Data Space credentials:")
-    username = input("Username: ").strip()
-    password = input("Password: ").strip()
-    
-    if not username or not password:
-        print("❌ Username and password required!")
-        return
+    # Credentials are only needed when no cached or refreshable token exists
+    username = password = None
+    if not (s2._tokens.load_valid() or s2._tokens.refresh(post=s2.session.post)):
+        username, password = get_credentials()
+        if not username or not password:
+            print("❌ Username and password required!")
+            print("   Set CDSE_USERNAME and CDSE_PASSWORD or store them with keyring.")
+            return
     
     # Test authentication
     print(f"\n🔐 Testing authentication...")
@@ -192,6 +368,13 @@ def test_real_sentinel2_access():
         products = s2.search_products_dusseldorf(days_back=14, max_cloud=30)
         
         if products:
+            # Only the best product's download info is used: fetch just that one,
+            # in the background while the product list is printed
+            best_product = min(products, key=lambda x: x['cloud_cover'])
+            executor = ThreadPoolExecutor(max_workers=1)
+            download_info_future = executor.submit(s2.get_product_download_info, best_product['id'])
+            executor.shutdown(wait=False)
+            
             print(f"\n📋 Available products:")
             for i, product in enumerate(products, 1):
                 status = "✅ Good" if product['suitable_for_analysis'] else "⚠️ Cloudy"
@@ -201,11 +384,10 @@ def test_real_sentinel2_access():
                 print()
             
             # Show download info for best product
-            best_product = min(products, key=lambda x: x['cloud_cover'])
             print(f"🏆 Best product (lowest cloud cover):")
             print(f"   ID: {best_product['id']}")
             
-            download_info = s2.get_product_download_info(best_product['id'])
+            download_info = download_info_future.result()
             if 'error' not in download_info:
                 print(f"   Download URL ready: ✅")
                 print(f"   Size: {download_info['size_gb']}GB")
@@ -3,9 +3,16 @@ Fixed Sentinel-2 Search with Correct OData Syntax
 =================================================
 """
 
-import requests
-from datetime import datetime, timedelta
+import re
+import orjson
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Dict, List
+from sentinel_http import BearerAuth, get_session
+from token_cache import TokenCache, get_credentials
+
+# MGRS tile field of a product name, e.g. _T32ULC_
+TILE_RE = re.compile(r"_(T\d{2}[A-Z]{3})_")
 
 
 class FixedSentinel2Search:
@@ -14,9 +21,22 @@ class FixedSentinel2Search:
     def __init__(self):
         self.api_base = "https://catalogue.dataspace.copernicus.eu"
         self.access_token = None
+        self.auth = None
+        self._tokens = TokenCache()
+        
+        # Shared keep-alive connection pool for auth, search and product calls
+        self.session = get_session()
     
     def authenticate(self, username: str, password: str) -> bool:
         """Authenticate with Copernicus Data Space."""
+        # Reuse a cached token, or refresh it, before sending the password
+        cached = self._tokens.load_valid() or self._tokens.refresh(post=self.session.post)
+        if cached:
+            self.access_token = cached['access_token']
+            self.auth = BearerAuth(self.access_token)
+            print("✅ Using cached token")
+            return True
+        
         try:
             print(f"🔐 Authenticating...")
             
@@ -30,11 +50,13 @@ class FixedSentinel2Search:
                 'client_id': 'cdse-public'
             }
             
-            response = requests.post(auth_url, data=auth_data, timeout=30)
+            response = self.session.post(auth_url, data=auth_data, timeout=30)
             
             if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
+                token_data = orjson.loads(response.content)
+                self._tokens = TokenCache(username=username)
+                self.access_token = self._tokens.save(token_data)['access_token']
+                self.auth = BearerAuth(self.access_token)
                 print("✅ Authentication successful!")
                 return True
             else:
@@ -45,52 +67,49 @@ class FixedSentinel2Search:
             print(f"❌ Auth error: {e}")
             return False
     
-    def search_simple(self, days_back: int = 7) -> List[Dict]:
-        """Simplified search without complex geometry."""
+    def search_simple(self, days_back: int = 7, max_cloud: float = 100.0) -> List[Dict]:
+        """Search Düsseldorf products via STAC, filtered by area, date and clouds on the server."""
         
         print(f"🔍 Searching Sentinel-2 products (last {days_back} days)")
         
-        end_date = datetime.now()
+        end_date = datetime.now(timezone.utc)
         start_date = end_date - timedelta(days=days_back)
         
         try:
-            search_url = f"{self.api_base}/odata/v1/Products"
+            search_url = f"{self.api_base}/stac/search"
             
-            # Simplified filter - just collection and date
-            params = {
-                '$filter': (f"Collection/Name eq 'SENTINEL-2' and "
-                           f"ContentDate/Start ge {start_date.strftime('%Y-%m-%d')}T00:00:00.000Z"),
-                '$orderby': 'ContentDate/Start desc',
-                '$top': '10'
+            search_data = {
+                "collections": ["SENTINEL-2"],
+                "bbox": [6.65, 51.10, 6.95, 51.35],  # Düsseldorf
+                "datetime": f"{start_date:%Y-%m-%dT%H:%M:%SZ}/{end_date:%Y-%m-%dT%H:%M:%SZ}",
+                "query": {"eo:cloud_cover": {"lte": max_cloud}},
+                "limit": 10,
+                "sortby": [{"field": "properties.datetime", "direction": "desc"}],
+                # Only return what is read below - skips geometry, links and the full asset list
+                "fields": {
+                    "include": ["id", "properties.datetime", "properties.eo:cloud_cover", "assets.visual.href"],
+                    "exclude": ["geometry", "links"]
+                }
             }
             
-            response = requests.get(search_url, params=params, timeout=30)
+            response = self.session.post(search_url, json=search_data, timeout=30, auth=self.auth)
             
             if response.status_code == 200:
-                data = response.json()
-                products = data.get('value', [])
+                items = orjson.loads(response.content).get('features', [])
                 
-                print(f"✅ Found {len(products)} products")
-                
-                # Filter for Düsseldorf area manually
                 dusseldorf_products = []
-                
-                for product in products:
-                    name = product.get('Name', '')
+                for item in items:
+                    props = item.get('properties', {})
+                    assets = item.get('assets', {})
                     
-                    # Sentinel-2 naming: S2A_MSIL1C_20231108T103031_N0509_R108_T32ULC_20231108T124649
-                    # T32ULC is the tile that covers Düsseldorf
-                    if 'T32UL' in name:  # Covers Düsseldorf area
-                        cloud_cover = self._extract_cloud_cover(product)
-                        
-                        dusseldorf_products.append({
-                            'id': product['Id'],
-                            'name': name,
-                            'date': product['ContentDate']['Start'][:10],
-                            'cloud_cover': cloud_cover,
-                            'tile': self._extract_tile(name),
-                            'size_gb': round(product['ContentLength'] / 1024**3, 2)
-                        })
+                    dusseldorf_products.append({
+                        'id': item['id'],
+                        'name': item['id'],
+                        'date': props.get('datetime', '')[:10],
+                        'cloud_cover': round(props.get('eo:cloud_cover', 0.0), 1),
+                        'tile': self._extract_tile(item['id']),
+                        'preview_url': assets.get('visual', {}).get('href')
+                    })
                 
                 print(f"🎯 Düsseldorf area products: {len(dusseldorf_products)}")
                 return dusseldorf_products
@@ -104,30 +123,37 @@ class FixedSentinel2Search:
             print(f"❌ Search error: {e}")
             return []
     
-    def _extract_cloud_cover(self, product: Dict) -> float:
-        """Extract cloud cover from product attributes."""
-        try:
-            for attr in product.get('Attributes', []):
-                if attr.get('Name') == 'cloudCover':
-                    return round(attr.get('Value', 0), 1)
-            return 0.0
-        except:
-            return 0.0
-    
-    def _extract_tile(self, name: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _extract_tile(name: str) -> str:
         """Extract tile ID from product name."""
-        parts = name.split('_')
-        for part in parts:
-            if part.startswith('T') and len(part) == 6:  # e.g., T32ULC
-                return part
-        return 'Unknown'
+        match = TILE_RE.search(name)
+        return match.group(1) if match else 'Unknown'
     
-    def get_download_link(self, product_id: str) -> str:
-        """Get direct download link for a product."""
+    def get_download_link(self, product_name: str) -> str:
+        """
+        Get direct download link for a product.
+        
+        STAC item ids are product names, but the zipper expects the OData
+        product UUID, so it is looked up by name first.
+        """
         if not self.access_token:
             return "❌ Not authenticated"
         
-        download_url = f"https://zipper.dataspace.copernicus.eu/odata/v1/Products({product_id})/$value"
+        try:
+            response = self.session.get(f"{self.api_base}/odata/v1/Products", params={
+                '$filter': f"startswith(Name,'{product_name}')",
+                '$select': 'Id',
+                '$top': 1
+            }, timeout=30)
+            matches = orjson.loads(response.content).get('value', []) if response.status_code == 200 else []
+        except Exception as e:
+            return f"❌ Lookup error: {e}"
+        
+        if not matches:
+            return f"❌ No OData product named {product_name}"
+        
+        download_url = f"https://zipper.dataspace.copernicus.eu/odata/v1/Products({matches[0]['Id']})/$value"
         return f"✅ Ready: {download_url}"
 
 
@@ -138,9 +164,12 @@ def quick_test():
     
     s2 = FixedSentinel2Search()
     
-    # Use your credentials directly (since they worked)
-    username = "christopher-george@web.de"
-    password = "***REMOVED***"
+    username = password = None
+    if not (s2._tokens.load_valid() or s2._tokens.refresh(post=s2.session.post)):
+        username, password = get_credentials()
+        if not username or not password:
+            print("❌ Set CDSE_USERNAME and CDSE_PASSWORD or store them with keyring.")
+            return
     
     if s2.authenticate(username, password):
         # Search for recent products
@@ -152,12 +181,12 @@ def quick_test():
                 status = "🟢 Clear" if product['cloud_cover'] < 10 else "🌥️ Cloudy" if product['cloud_cover'] < 30 else "☁️ Very cloudy"
                 
                 print(f"{i}. {product['tile']} - {product['date']}")
-                print(f"   Cloud: {product['cloud_cover']}% | Size: {product['size_gb']}GB")
+                print(f"   Cloud: {product['cloud_cover']}%")
                 print(f"   Status: {status}")
                 print(f"   ID: {product['id']}")
                 
                 if i == 1:  # Show download link for best product
-                    download_link = s2.get_download_link(product['id'])
+                    download_link = s2.get_download_link(product['name'])
                     print(f"   Download: {download_link}")
                 print()
         
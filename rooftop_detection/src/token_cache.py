@@ -0,0 +1,168 @@
+"""
+Copernicus Token Cache
+======================
+
+Persist CDSE OAuth tokens between runs so scripts reuse a valid access token
+or a refresh token instead of sending the password every time.
+"""
+
+import getpass
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+AUTH_URL = ("https://identity.dataspace.copernicus.eu/auth/realms/"
+            "CDSE/protocol/openid-connect/token")
+
+# One file for all cached tokens, keyed by OAuth client and account
+TOKEN_CACHE_PATH = Path.home() / '.cache' / 'social-sports' / 'token.json'
+
+# Tokens this close to expiry are treated as expired
+EXPIRY_SLACK_S = 60
+
+# Keyring service holding the CDSE account (keyring set cdse <user>)
+KEYRING_SERVICE = 'cdse'
+
+
+def _keyring_get(username: str) -> Optional[str]:
+    if keyring is None:
+        return None
+    try:
+        return keyring.get_password(KEYRING_SERVICE, username)
+    except Exception:
+        return None
+
+
+def get_credentials() -> Tuple[Optional[str], Optional[str]]:
+    """
+    Look up Copernicus credentials without blocking unattended runs.
+    
+    Order: CDSE_USERNAME/CDSE_PASSWORD environment variables, then the
+    system keyring, then an interactive prompt - only when stdin is a tty.
+    
+    Returns:
+        (username, password); either may be None if nothing was found
+    """
+    username = os.environ.get('CDSE_USERNAME') or _keyring_get('default_user')
+    password = os.environ.get('CDSE_PASSWORD') or (_keyring_get(username) if username else None)
+    
+    if not (username and password) and sys.stdin.isatty():
+        print("\n📝 Enter your Copernicus Data Space credentials:")
+        username = username or input("Username: ").strip()
+        password = password or getpass.getpass("Password: ")
+    
+    return username or None, password or None
+
+
+class TokenCache:
+    """
+    Load, refresh and store Copernicus access tokens on disk.
+    
+    Tokens are kept per "<client_id>:<username>" entry in one file, so
+    different accounts and OAuth clients never overwrite each other.
+    Without a username the freshest token of the client is used.
+    """
+    
+    def __init__(self, client_id: str = 'cdse-public', username: Optional[str] = None,
+                 path: Path = TOKEN_CACHE_PATH):
+        self.client_id = client_id
+        self.username = username
+        self.path = path
+    
+    @property
+    def key(self) -> str:
+        return f"{self.client_id}:{self.username or ''}"
+    
+    def _read_all(self) -> Dict:
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        # Files from before the per-account layout hold one bare entry; skip its fields
+        return {k: v for k, v in entries.items() if isinstance(v, dict)}
+    
+    def _read(self) -> Dict:
+        entries = self._read_all()
+        if self.username:
+            return entries.get(self.key, {})
+        
+        prefix = f"{self.client_id}:"
+        own = [(k, v) for k, v in entries.items() if k.startswith(prefix)]
+        if not own:
+            return {}
+        key, cached = max(own, key=lambda kv: kv[1].get('expires_at', 0))
+        # Keep refreshes of this token under the account it was issued to
+        self.username = key[len(prefix):] or None
+        return cached
+    
+    def load_valid(self) -> Optional[Dict]:
+        """Cached token entry if its access token is still usable, else None."""
+        cached = self._read()
+        if cached.get('access_token') and cached.get('expires_at', 0) - EXPIRY_SLACK_S > time.time():
+            return cached
+        return None
+    
+    def refresh(self, post: Callable = requests.post) -> Optional[Dict]:
+        """
+        Exchange a cached refresh token for a new access token.
+        
+        Args:
+            post: Function used to send the token request (e.g. a session's post)
+            
+        Returns:
+            The new token entry, or None if there is no usable refresh token
+        """
+        cached = self._read()
+        if not cached.get('refresh_token') or cached.get('refresh_expires_at', 0) <= time.time():
+            return None
+        
+        try:
+            response = post(AUTH_URL, data={
+                'grant_type': 'refresh_token',
+                'refresh_token': cached['refresh_token'],
+                'client_id': self.client_id
+            }, timeout=30)
+        except requests.RequestException:
+            return None
+        
+        if response.status_code != 200:
+            return None
+        return self.save(response.json())
+    
+    def save(self, token_data: Dict) -> Dict:
+        """Store a token response with absolute expiry times (mode 0600, atomic replace)."""
+        now = time.time()
+        entry = {
+            'access_token': token_data['access_token'],
+            'refresh_token': token_data.get('refresh_token'),
+            'expires_at': now + token_data.get('expires_in', 0),
+            'refresh_expires_at': now + token_data.get('refresh_expires_in', 0)
+        }
+        
+        entries = self._read_all()
+        entries[self.key] = entry
+        
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.json.tmp')
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not cache token: {e}")
+        
+        return entry
@@ -1,27 +1,29 @@
 # --- CONFIG ---
-METRIC_GEOJSON = "filtered.geojson"  # your metric polygons already filtered to bbox (from earlier step)
+METRIC_FILE = "filtered.parquet"  # your metric polygons already filtered to bbox (from earlier step)
 REGIONS_GEOJSON = "lor_bezirksregionen.geojson"  # LOR Bezirksregionen (EPSG:25833)
 SOCCER_CSV = (
     "berlin_soccer_fields.csv"  # your OSM soccer CSV (lon/lat columns: lon, lat)
 )
 ROOFTOPS_GEOJSON = "berlin_rooftops.geojson"  # optional overlay
-VALUE_FIELD = "value"  # metric attribute in METRIC_GEOJSON
+VALUE_FIELD = "value"  # metric attribute in METRIC_FILE
 HTML_OUT = "index.html"
+DISPLAY_SIMPLIFY_DEG = 0.0001  # ~7–11 m; display-only simplification of region outlines
 
-import json
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 import folium
+import shapely
 from shapely.geometry import Point
 from pathlib import Path
 import branca.colormap as cm
-from utils_to_map import add_soccer_fields_to_map
+from utils_crs import get_transformer, reproject
+from utils_to_map import add_soccer_fields_to_map, colormap_lookup
 
 here = Path(__file__).parent
 
 # ---------- 1) LOAD REGIONS (EPSG:25833) ----------
-regions = gpd.read_file(here / REGIONS_GEOJSON)
+regions = gpd.read_file(here / REGIONS_GEOJSON, engine="pyogrio", use_arrow=True)
 if regions.crs is None:
     # LOR file declares EPSG:25833 in your snippet; set if missing
     regions = regions.set_crs(25833, allow_override=True)
@@ -29,7 +31,12 @@ elif regions.crs.to_epsg() != 25833:
     regions = regions.to_crs(25833)
 
 # ---------- 2) LOAD METRIC POLYGONS & AREA-WEIGHTED SUM BY REGION ----------
-poly = gpd.read_file(here / METRIC_GEOJSON)
+metric_path = here / METRIC_FILE
+poly = (
+    gpd.read_parquet(metric_path)
+    if metric_path.suffix == ".parquet"
+    else gpd.read_file(metric_path, engine="pyogrio", use_arrow=True)
+)
 if poly.crs is None:
     # If unknown, assume WGS84 (common for GeoJSON). Change if your file says otherwise.
     poly = poly.set_crs(4326, allow_override=True)
@@ -38,45 +45,63 @@ poly = poly.copy()
 poly[VALUE_FIELD] = pd.to_numeric(poly[VALUE_FIELD], errors="coerce")
 poly = poly[poly[VALUE_FIELD].notna() & (poly[VALUE_FIELD] != 0)]
 # project metric polygons to same CRS as regions (meters) for area weights
-poly = poly.to_crs(regions.crs)
-poly["poly_area"] = poly.geometry.area
-
-# intersection
-inter = gpd.overlay(
-    poly[["geometry", VALUE_FIELD, "poly_area"]],
-    regions[["geometry"] + [c for c in regions.columns if c != "geometry"]],
-    how="intersection",
-    keep_geom_type=False,
+poly = reproject(poly, regions.crs)
+
+# choose a stable region key (use BEZIRKSREG + BEZIRKSNAM by default);
+# regions are grouped by integer codes of the column pair, and the
+# "REG (NAM)" label is only built once per unique pair for the tooltip
+region_key = "region_name"
+# missing columns and NaN keys fall back to "" so every region gets a code >= 0
+no_key = pd.Series("", index=regions.index)
+region_codes, region_pairs = pd.factorize(
+    pd.MultiIndex.from_arrays(
+        [
+            regions.get("BEZIRKSREG", no_key).fillna("").astype(str),
+            regions.get("BEZIRKSNAM", no_key).fillna("").astype(str),
+        ]
+    )
 )
-if inter.empty:
+region_labels = (
+    region_pairs.get_level_values(0) + " (" + region_pairs.get_level_values(1) + ")"
+).to_numpy()
+
+# intersection: STRtree finds candidate (polygon, region) pairs, then one
+# vectorized GEOS call computes all intersection areas; everything below
+# stays in flat numpy arrays indexed by the pair indices
+poly_geoms = np.asarray(poly.geometry)
+poly_values = poly[VALUE_FIELD].to_numpy(dtype=float)
+poly_area = shapely.area(poly_geoms)
+region_geoms = np.asarray(regions.geometry)
+region_tree = shapely.STRtree(region_geoms)
+poly_idx, region_idx = region_tree.query(poly_geoms, predicate="intersects")
+if len(poly_idx) == 0:
     raise RuntimeError("No overlap between metric polygons and LOR regions.")
 
-inter["inter_area"] = inter.geometry.area
-inter = inter[inter["poly_area"] > 0]
-inter["weighted_value"] = inter[VALUE_FIELD] * (
-    inter["inter_area"] / inter["poly_area"]
+inter_area = shapely.area(
+    shapely.intersection(poly_geoms[poly_idx], region_geoms[region_idx])
 )
-
-# choose a stable region key (use BEZIRKSREG + BEZIRKSNAM by default)
-region_key = "region_name"
-inter[region_key] = (
-    inter.get("BEZIRKSREG", "").astype(str)
-    + " ("
-    + inter.get("BEZIRKSNAM", "").astype(str)
-    + ")"
+pair_poly_area = poly_area[poly_idx]
+# degenerate (zero-area) polygons contribute nothing
+weighted_value = np.divide(
+    poly_values[poly_idx] * inter_area,
+    pair_poly_area,
+    out=np.zeros_like(inter_area),
+    where=pair_poly_area > 0,
 )
 
-value_by_region = (
-    inter.groupby(region_key, as_index=False)["weighted_value"]
-    .sum()
-    .rename(columns={"weighted_value": "value"})
+# sum per region key with one bincount over the region codes
+value_by_code = np.bincount(
+    region_codes[region_idx],
+    weights=weighted_value,
+    minlength=len(region_pairs),
 )
 
 # ---------- 3) LOAD SOCCER POINTS & COUNT PER REGION ----------
 df = pd.read_csv(here / SOCCER_CSV)
 # filter to soccer rows if column exists
 if "sport" in df.columns:
-    df = df[df["sport"].astype(str).str.contains("soccer", case=False, na=False)]
+    sport = df["sport"].astype("string[pyarrow]")
+    df = df[sport.str.contains("soccer", case=False, regex=False, na=False)]
 # dedupe by OSM id if present
 if {"osm_type", "osm_id"}.issubset(df.columns):
     df = df.drop_duplicates(subset=["osm_type", "osm_id"])
@@ -84,53 +109,48 @@ if {"osm_type", "osm_id"}.issubset(df.columns):
 # build points (CSV is lon/lat in WGS84)
 if not {"lon", "lat"}.issubset(df.columns):
     raise KeyError("CSV must contain 'lon' and 'lat' columns.")
-pts = gpd.GeoDataFrame(
-    df, geometry=gpd.points_from_xy(df["lon"], df["lat"]), crs=4326
-).to_crs(regions.crs)
-
-# spatial join: which region each point falls in
-join_pts = gpd.sjoin(
-    pts[["geometry"]],
-    regions.assign(
-        **{
-            region_key: regions.get("BEZIRKSREG", "").astype(str)
-            + " ("
-            + regions.get("BEZIRKSNAM", "").astype(str)
-            + ")"
-        }
-    ),
-    how="left",
-    predicate="within",
-)
-soccer_counts = (
-    join_pts.groupby(region_key, as_index=False)
-    .size()
-    .rename(columns={"size": "soccer_count"})
+# project the raw coordinates first, then build all points in one call
+xs, ys = get_transformer(4326, regions.crs).transform(
+    df["lon"].to_numpy(), df["lat"].to_numpy()
 )
+pt_geoms = shapely.points(xs, ys)
+
+# point-in-polygon: which region each point falls in, counted per region key
+# (like the metric) so every polygon of a multi-part region gets the key's total
+_, pt_region_idx = region_tree.query(pt_geoms, predicate="within")
+soccer_by_code = np.bincount(region_codes[pt_region_idx], minlength=len(region_pairs))
 
 # ---------- 4) MERGE METRIC + SOCCER & COMPUTE RATIO ----------
-regions_out = regions.assign(
-    **{
-        region_key: regions.get("BEZIRKSREG", "").astype(str)
-        + " ("
-        + regions.get("BEZIRKSNAM", "").astype(str)
-        + ")"
-    }
-)
-out = regions_out[[region_key, "geometry"]].merge(
-    value_by_region, on=region_key, how="left"
+out = gpd.GeoDataFrame(
+    {
+        region_key: region_labels[region_codes],
+        "value": value_by_code[region_codes],
+        "soccer_count": soccer_by_code[region_codes],
+    },
+    geometry=regions.geometry.values,
+    crs=regions.crs,
 )
-out = out.merge(soccer_counts, on=region_key, how="left")
-out["value"] = out["value"].fillna(0.0)
-out["soccer_count"] = out["soccer_count"].fillna(0).astype(int)
 out["ratio"] = np.where(out["value"] > 0, out["soccer_count"] / out["value"], np.nan)
 out["ratio"] = out["ratio"] / out["ratio"].max()
 
 
 # ---------- 5) FOLIUM MAP (RdYlGn: red→yellow→green) ----------
-# bounds & reproject to WGS84 for folium
-out_wgs = out.to_crs(4326)
-minx, miny, maxx, maxy = out_wgs.total_bounds
+# bounds & reproject to WGS84 for folium: all vertices go through one
+# vectorized pyproj call on the flat (N, 2) coordinate array
+out_wgs = reproject(out, 4326)
+# thin out vertices for the map only; all areas above use the full geometries
+out_wgs = out_wgs.set_geometry(
+    shapely.simplify(
+        np.asarray(out_wgs.geometry), DISPLAY_SIMPLIFY_DEG, preserve_topology=True
+    ),
+    crs=4326,
+)
+# bounds in the native CRS; only the 4 corners are reprojected
+bx0, by0, bx1, by1 = out.total_bounds
+lons, lats = get_transformer(out.crs, 4326).transform(
+    [bx0, bx1, bx0, bx1], [by0, by0, by1, by1]
+)
+minx, miny, maxx, maxy = min(lons), min(lats), max(lons), max(lats)
 center = [(miny + maxy) / 2, (minx + maxx) / 2]
 
 # robust vmin/vmax (clip outliers)
@@ -152,14 +172,18 @@ cmap.caption = "Soccer fields / Population (ratio)"
 
 m = folium.Map(location=center, zoom_start=12, tiles="cartodbpositron")
 
-gj = json.loads(out_wgs.to_json())
+out_wgs["fillColor"] = colormap_lookup(out_wgs["ratio"], cmap)
+gj = out_wgs.to_geo_dict()
+
+
+# fillColor is None exactly where the ratio is missing, so no NaN check per feature
+GREY_STYLE = {"fillOpacity": 0.0, "color": "#999", "weight": 0.8}
+COLOR_STYLE_BASE = {"color": "#333", "weight": 0.8, "fillOpacity": 0.55}
 
 
 def style_fn(feat):
-    r = feat["properties"].get("ratio")
-    if r is None or (isinstance(r, float) and np.isnan(r)):
-        return {"fillOpacity": 0.0, "color": "#999", "weight": 0.8}
-    return {"fillColor": cmap(r), "color": "#333", "weight": 0.8, "fillOpacity": 0.55}
+    color = feat["properties"]["fillColor"]
+    return GREY_STYLE if color is None else {**COLOR_STYLE_BASE, "fillColor": color}
 
 
 folium.GeoJson(
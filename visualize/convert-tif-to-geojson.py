@@ -1,8 +1,130 @@
 # pip install GDAL
+from concurrent.futures import ProcessPoolExecutor
 from osgeo import gdal, ogr, osr
+import numpy as np
 import os
+import shapely
+import shutil
 import sys
+import tempfile
 import time
+from xml.sax.saxutils import escape
+
+
+def _polygonize_tile(
+    tif_path: str, band_index: int, src_win, raster_size, out_gpkg: str
+):
+    """
+    Polygonize one pixel window of the raster into its own GeoPackage.
+
+    Polygons touching an edge shared with a neighbouring tile are removed from
+    the GeoPackage and returned as (value, WKB) pairs, so the caller can
+    dissolve them with their other halves across the seam.
+    """
+    gdal.UseExceptions()
+    # VRT window: no pixel copy, the source is read lazily by Polygonize
+    tile = gdal.Translate(
+        "", tif_path, format="VRT", srcWin=src_win, bandList=[band_index]
+    )
+    band = tile.GetRasterBand(1)
+
+    vg = ogr.GetDriverByName("GPKG").CreateDataSource(out_gpkg)
+    layer = vg.CreateLayer("polys", srs=tile.GetSpatialRef(), geom_type=ogr.wkbPolygon)
+    layer.CreateField(
+        ogr.FieldDefn(
+            "value",
+            ogr.OFTInteger if band.DataType <= gdal.GDT_Int32 else ogr.OFTReal,
+        )
+    )
+    gdal.Polygonize(
+        srcBand=band,
+        maskBand=band.GetMaskBand(),
+        outLayer=layer,
+        iPixValField=0,
+        callback=None,
+    )
+
+    # Thin strips (half a pixel wide) along the interior tile edges
+    xoff, yoff, width, height = src_win
+    x0, px, _, y0, _, py = tile.GetGeoTransform()
+    x1, y1 = x0 + width * px, y0 + height * py
+    ymin, ymax = min(y0, y1), max(y0, y1)
+    ex, ey = abs(px) / 2, abs(py) / 2
+    strips = []
+    if xoff > 0:
+        strips.append((x0 - ex, ymin, x0 + ex, ymax))
+    if xoff + width < raster_size[0]:
+        strips.append((x1 - ex, ymin, x1 + ex, ymax))
+    if yoff > 0:
+        strips.append((x0, y0 - ey, x1, y0 + ey))
+    if yoff + height < raster_size[1]:
+        strips.append((x0, y1 - ey, x1, y1 + ey))
+
+    seam_parts = {}
+    for strip in strips:
+        layer.SetSpatialFilterRect(*strip)
+        for feature in layer:
+            seam_parts[feature.GetFID()] = (
+                feature.GetField(0),
+                bytes(feature.GetGeometryRef().ExportToWkb()),
+            )
+    layer.SetSpatialFilter(None)
+
+    vg.StartTransaction()
+    for fid in seam_parts:
+        layer.DeleteFeature(fid)
+    vg.CommitTransaction()
+
+    layer = None
+    vg = None
+    tile = None
+    return list(seam_parts.values())
+
+
+def _dissolve_seam_parts(values, geoms, grid_size):
+    """
+    Union seam polygons that share an edge and a value across a tile seam.
+
+    Tiles compute their pixel corners from their own origin, so the two sides
+    of a seam can differ in the last bits; snapping to grid_size (a small
+    fraction of a pixel) makes them coincide. Same-value parts that only meet
+    at a corner stay separate, as in GDAL's 4-connected polygonize.
+    """
+    geoms = shapely.set_precision(geoms, grid_size)
+    left, right = shapely.STRtree(geoms).query(geoms, predicate="intersects")
+    keep = (left < right) & (values[left] == values[right])
+    left, right = left[keep], right[keep]
+    shared = shapely.length(shapely.intersection(geoms[left], geoms[right])) > 0
+    left, right = left[shared], right[shared]
+
+    # Union-find over the edge-sharing pairs
+    parent = np.arange(len(geoms))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in zip(left, right):
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    roots = np.array([root(i) for i in range(len(geoms))])
+
+    out_values, out_geoms = [], []
+    for r in np.unique(roots):
+        members = np.flatnonzero(roots == r)
+        merged = (
+            geoms[members[0]]
+            if len(members) == 1
+            else shapely.union_all(geoms[members])
+        )
+        # A region is one 4-connected polygon; split anything else back up
+        parts = shapely.get_parts(merged)
+        out_geoms.extend(parts)
+        out_values.extend([values[r]] * len(parts))
+    return np.asarray(out_values), np.asarray(out_geoms)
 
 
 def tif_to_geojson(
@@ -10,6 +132,8 @@ def tif_to_geojson(
     out_geojson: str = "raster_polygons.geojson",
     band_index: int = 1,
     simplify_tolerance_deg: float | None = 0.00005,  # 5–6 m tolerance
+    tile_size: int = 2048,  # pixels per tile side for parallel polygonization
+    workers: int | None = None,  # defaults to os.cpu_count()
 ):
     gdal.UseExceptions()
 
@@ -32,7 +156,6 @@ def tif_to_geojson(
     nodata = band.GetNoDataValue()
     print(f"[INFO] Nodata value: {nodata}")
 
-    mask_band = band.GetMaskBand()
     wkt = ds.GetProjection()
     src_srs = osr.SpatialReference()
     if wkt:
@@ -42,42 +165,92 @@ def tif_to_geojson(
         print("[WARN] No projection found in source raster.")
         src_srs = None
 
-    # --- 2) Create in-memory layer ---
-    print("[INFO] Creating in-memory GeoPackage for intermediate output...")
-    drv_gpkg = ogr.GetDriverByName("GPKG")
-    mem_path = "/vsimem/polys.gpkg"
-    try:
-        drv_gpkg.DeleteDataSource(mem_path)
-    except Exception:
-        pass
-    vg = drv_gpkg.CreateDataSource(mem_path)
-    if vg is None:
-        raise RuntimeError("❌ Could not create in-memory GPKG data source")
-
-    layer = vg.CreateLayer("polys", srs=src_srs, geom_type=ogr.wkbPolygon)
-    print("[INFO] Layer created in memory.")
-
-    gdal_type = band.DataType
-    fld_def = ogr.FieldDefn(
-        "value", ogr.OFTInteger if gdal_type <= gdal.GDT_Int32 else ogr.OFTReal
+    # --- 2) Polygonize tiles in parallel, one GeoPackage per tile ---
+    # Polygons that cross a tile edge are split there. Downstream sums weight
+    # each polygon's value by its area share, so a split region would count
+    # once per part; the seam parts are dissolved back together in step 3.
+    windows = [
+        (
+            xoff,
+            yoff,
+            min(tile_size, ds.RasterXSize - xoff),
+            min(tile_size, ds.RasterYSize - yoff),
+        )
+        for yoff in range(0, ds.RasterYSize, tile_size)
+        for xoff in range(0, ds.RasterXSize, tile_size)
+    ]
+    print(
+        f"[INFO] Starting polygonization of {len(windows)} tiles "
+        f"on {workers or os.cpu_count()} processes... (this may take several minutes)"
     )
-    layer.CreateField(fld_def)
-    print("[INFO] Attribute field 'value' created.")
-
-    # --- 3) Polygonize ---
-    print("[INFO] Starting polygonization... (this may take several minutes)")
     t0 = time.time()
-    gdal.Polygonize(
-        srcBand=band, maskBand=mask_band, outLayer=layer, iPixValField=0, callback=None
-    )
+    tmp_dir = tempfile.mkdtemp(prefix="polygonize_")
+    tile_paths = [os.path.join(tmp_dir, f"tile_{i}.gpkg") for i in range(len(windows))]
+    raster_size = (ds.RasterXSize, ds.RasterYSize)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        seam_parts = [
+            part
+            for parts in executor.map(
+                _polygonize_tile,
+                [tif_path] * len(windows),
+                [band_index] * len(windows),
+                windows,
+                [raster_size] * len(windows),
+                tile_paths,
+            )
+            for part in parts
+        ]
     t_poly = time.time() - t0
     print(f"[DONE] Polygonization complete in {t_poly:.2f} seconds.")
 
+    # --- 3) Dissolve polygons split at tile seams into their own layer ---
+    t0 = time.time()
+    gt = ds.GetGeoTransform()
+    seam_values, seam_geoms = _dissolve_seam_parts(
+        np.array([value for value, _ in seam_parts]),
+        shapely.from_wkb([wkb for _, wkb in seam_parts]),
+        grid_size=min(abs(gt[1]), abs(gt[5])) / 1000,
+    )
+    seams_path = os.path.join(tmp_dir, "seams.gpkg")
+    vg = ogr.GetDriverByName("GPKG").CreateDataSource(seams_path)
+    layer = vg.CreateLayer("polys", srs=src_srs, geom_type=ogr.wkbPolygon)
+    layer.CreateField(
+        ogr.FieldDefn(
+            "value",
+            ogr.OFTInteger if band.DataType <= gdal.GDT_Int32 else ogr.OFTReal,
+        )
+    )
+    defn = layer.GetLayerDefn()
+    vg.StartTransaction()
+    for value, wkb in zip(seam_values.tolist(), shapely.to_wkb(seam_geoms)):
+        feature = ogr.Feature(defn)
+        feature.SetField(0, value)
+        feature.SetGeometry(ogr.CreateGeometryFromWkb(wkb))
+        layer.CreateFeature(feature)
+    vg.CommitTransaction()
     layer = None
     vg = None
-    print("[INFO] Intermediate polygons written to /vsimem memory store.")
+    tile_paths.append(seams_path)
+    print(
+        f"[DONE] {len(seam_parts)} seam parts dissolved into {len(seam_geoms)} "
+        f"polygons in {time.time() - t0:.2f} seconds."
+    )
+
+    # --- 4) Expose the tiles as one layer (OGR VRT union, no merged copy) ---
+    vrt_path = "/vsimem/polys.vrt"
+    union_layers = "".join(
+        f'<OGRVRTLayer name="tile_{i}"><SrcDataSource>{escape(path)}</SrcDataSource>'
+        "<SrcLayer>polys</SrcLayer></OGRVRTLayer>"
+        for i, path in enumerate(tile_paths)
+    )
+    gdal.FileFromMemBuffer(
+        vrt_path,
+        "<OGRVRTDataSource><OGRVRTUnionLayer name=\"polys\">"
+        f"{union_layers}</OGRVRTUnionLayer></OGRVRTDataSource>",
+    )
+    print(f"[INFO] {len(tile_paths)} tile layers unioned in {vrt_path}.")
 
-    # --- 4) Reproject & (optionally) simplify, then write GeoJSON ---
+    # --- 5) Reproject & (optionally) simplify, then write GeoJSON ---
     print("[INFO] Reprojecting to EPSG:4326 and writing GeoJSON...")
 
     # Build ogr2ogr-style flags
@@ -104,20 +277,11 @@ def tif_to_geojson(
     os.makedirs(os.path.dirname(os.path.abspath(out_geojson)) or ".", exist_ok=True)
 
     t0 = time.time()
-    out_ds = gdal.VectorTranslate(out_geojson, srcDS=mem_path, options=vt_opts)
-    t_reproj = time.time() - t0
-    if out_ds is None:
-        raise RuntimeError("❌ VectorTranslate failed")
-    out_ds = None
-
-    print(f"[DONE] GeoJSON saved: {out_geojson}")
-    print(f"       Reprojection/simplify time: {t_reproj:.2f} seconds")
-    os.makedirs(os.path.dirname(os.path.abspath(out_geojson)) or ".", exist_ok=True)
-
-    t0 = time.time()
-    out_ds = gdal.VectorTranslate(
-        destNameOrDestDS=out_geojson, srcDS=mem_path, options=vt_opts
-    )
+    try:
+        out_ds = gdal.VectorTranslate(out_geojson, srcDS=vrt_path, options=vt_opts)
+    finally:
+        gdal.Unlink(vrt_path)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
     t_reproj = time.time() - t0
     if out_ds is None:
         raise RuntimeError("❌ VectorTranslate failed")
@@ -126,7 +290,6 @@ def tif_to_geojson(
     print(f"[DONE] GeoJSON saved: {out_geojson}")
     print(f"       Reprojection/simplify time: {t_reproj:.2f} seconds")
 
-    drv_gpkg.DeleteDataSource(mem_path)
     total = time.time() - start_time
     print(f"[SUCCESS] Finished entire process in {total:.2f} seconds.\n")
 
@@ -1,3 +1,4 @@
+import ijson
 import requests
 import pandas as pd
 
@@ -23,41 +24,47 @@ area["wikidata"="Q64"]->.searchArea;
 out tags center;
 """
 
-resp = requests.post(overpass_url, data={"data": query})
-resp.raise_for_status()
-elements = resp.json()["elements"]
-
-
-def get_latlon(el):
-    if el["type"] == "node":
-        return el.get("lat"), el.get("lon")
-    c = el.get("center")
-    return (c["lat"], c["lon"]) if c else (None, None)
-
-
-rows = []
-stadium_count = 0
-for el in elements:
-    tags = el.get("tags", {})
-    lat, lon = get_latlon(el)
-    rows.append(
-        {
-            "osm_type": el["type"],
-            "osm_id": el["id"],
-            "name": tags.get("name"),
-            "leisure": tags.get("leisure"),
-            "sport": tags.get("sport"),
-            "surface": tags.get("surface"),
-            "addr:street": tags.get("addr:street"),
-            "addr:housenumber": tags.get("addr:housenumber"),
-            "operator": tags.get("operator"),
-            "access": tags.get("access"),
-            "website": tags.get("website"),
-            "lat": lat,
-            "lon": lon,
-            "tags": tags,  # keep all tags if you want to inspect later
-        }
-    )
-df = pd.DataFrame(rows).dropna(subset=["lat", "lon"])
+# Parse elements straight off the socket: the raw body is never held in memory
+# next to the decoded structure, and parsing overlaps the download
+with requests.post(overpass_url, data={"data": query}, stream=True) as resp:
+    resp.raise_for_status()
+    resp.raw.decode_content = True
+    elements = list(ijson.items(resp.raw, "elements.item", use_float=True))
+
+
+TAG_FIELDS = [
+    "name",
+    "leisure",
+    "sport",
+    "surface",
+    "addr:street",
+    "addr:housenumber",
+    "operator",
+    "access",
+    "website",
+]
+
+# Flatten all elements at once; tags become "tags.<key>" columns and
+# ways/relations carry their position in "center.lat"/"center.lon"
+flat = pd.json_normalize(elements)
+
+
+def column(name):
+    if name in flat:
+        return flat[name]
+    return pd.Series(None, index=flat.index, dtype=object)
+
+
+df = pd.DataFrame(
+    {
+        "osm_type": column("type"),
+        "osm_id": column("id"),
+        **{tag: column(f"tags.{tag}") for tag in TAG_FIELDS},
+        "lat": column("lat").fillna(column("center.lat")),
+        "lon": column("lon").fillna(column("center.lon")),
+        # keep all tags if you want to inspect later
+        "tags": [el.get("tags", {}) for el in elements],
+    }
+).dropna(subset=["lat", "lon"])
 df.to_csv("berlin_soccer_fields.csv", index=False, encoding="utf-8")
 print(f"Saved {len(df)} features to berlin_soccer_fields.csv")
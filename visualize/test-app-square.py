@@ -1,5 +1,4 @@
 # pip install geopandas shapely folium branca pandas pyogrio
-import json
 import pandas as pd
 import geopandas as gpd
 from pathlib import Path
@@ -9,14 +8,19 @@ from shapely.geometry import box
 import numpy as np
 import branca.colormap as cm
 
+from utils_crs import get_transformer, reproject
 from utils_regrid import regrid_sum_2km
 from utils_to_grid import add_soccer_counts_to_grid
-from utils_to_map import add_rooftops_to_map, add_soccer_fields_to_map
+from utils_to_map import (
+    add_rooftops_to_map,
+    add_soccer_fields_to_map,
+    colormap_lookup,
+)
 
 
 # ---------- CONFIG ----------
 GEOJSON_IN = "GHS_POP_E2030_GLOBE_R2023A_54009_100_V1_0_R3_C20.geojson"  # input GeoJSON from your polygonize step
-GEOJSON_OUT = "filtered.geojson"  # optional filtered output (for inspection)
+FILTERED_OUT = "filtered.parquet"  # cached bbox subset (GeoParquet, much faster than GeoJSON)
 HTML_OUT = "index.html"
 VALUE_FIELD = "value"  # attribute holding your metric
 BBOX = (12.9, 52.2, 13.9, 52.7)  # (min_lon, min_lat, max_lon, max_lat)
@@ -27,11 +31,12 @@ bbox_poly = box(min_lon, min_lat, max_lon, max_lat)
 
 print("[INFO] Loading features within bbox using GeoPandas…")
 # If pyogrio is available (modern GeoPandas), this streams only bbox features:
-if os.path.exists(GEOJSON_OUT):
-    gdf = gpd.read_file(GEOJSON_OUT, bbox=BBOX)
+if os.path.exists(FILTERED_OUT):
+    gdf = gpd.read_parquet(FILTERED_OUT, bbox=BBOX)
+    print(f"[INFO] Loaded {len(gdf)} features from {FILTERED_OUT}.")
 else:
     try:
-        gdf = gpd.read_file(GEOJSON_IN, bbox=BBOX)
+        gdf = gpd.read_file(GEOJSON_IN, bbox=BBOX, engine="pyogrio", use_arrow=True)
         print(f"[INFO] Loaded {len(gdf)} features (bbox read).")
     except TypeError:
         # Fallback: load all then filter (works everywhere but uses more RAM)
@@ -48,9 +53,9 @@ else:
         print("[INFO] Reprojecting to EPSG:4326 (WGS84)…")
         gdf = gdf.to_crs(4326)
 
-    # Optional: write filtered subset for debugging/inspection
-    gdf.to_file(GEOJSON_OUT, driver="GeoJSON")
-    print(f"[INFO] Wrote filtered GeoJSON → {GEOJSON_OUT}")
+    # Cache the filtered subset; the bbox covering column keeps bbox reads cheap
+    gdf.to_parquet(FILTERED_OUT, write_covering_bbox=True)
+    print(f"[INFO] Wrote filtered GeoParquet → {FILTERED_OUT}")
 
 
 # Keep only rows with a numeric VALUE_FIELD
@@ -71,51 +76,45 @@ gdf["soccer_count"] = gdf["soccer_count"].fillna(0).astype(int)
 gdf["ratio"] = gdf["soccer_count"] / gdf["value"]
 gdf["ratio"] /= gdf["ratio"].max()
 
-if "fid" not in gdf.columns:
-    gdf = gdf.reset_index(drop=True)
-    gdf["fid"] = gdf.index.astype(int)
-
 print("regrid to 2km grid:", gdf.head())
 
 
 if gdf.empty:
     raise RuntimeError(f"No features with numeric '{VALUE_FIELD}' after filtering.")
 
-# df_vals = gdf[["fid", VALUE_FIELD]].copy()
-
-# # Compute map center from bounds
-minx, miny, maxx, maxy = gdf.total_bounds
-center = [(miny + maxy) / 2.0, (minx + maxx) / 2.0]
-
-m = folium.Map(location=center, zoom_start=18, tiles="cartodbpositron")
-
 
-def add_ratio_fields_to_map(m, gdf):
-    gj = json.loads(gdf.to_crs(4326).to_json())
-    folium.Choropleth(
-        geo_data=gj,
-        name="Soccer fields (count)",
-        data=gdf[["tile_id", "ratio"]],
-        columns=["tile_id", "ratio"],
-        key_on="feature.properties.tile_id",
-        fill_color="OrRd",
-        fill_opacity=0.6,
-        line_opacity=0.1,
-        legend_name="Soccer fields/Population",
-    ).add_to(m)
+# Both layer adders take the WGS84 GeoJSON dict built once below, so the tiles
+# are reprojected and serialized a single time
+def add_ratio_fields_to_map(m, gj):
+    # Colors come straight from properties.ratio in one GeoJson layer (with its
+    # tooltip), instead of a Choropleth re-joining a DataFrame by tile_id plus a
+    # second GeoJson copy just for the tooltip
+    ratio_cmap = cm.linear.OrRd_09.scale(0.0, 1.0)
+    ratio_cmap.caption = "Soccer fields/Population"
+
+    def ratio_style(feature):
+        ratio = feature["properties"]["ratio"]
+        if ratio is None:
+            return {"fillOpacity": 0.0, "weight": 0.1, "color": "black"}
+        return {
+            "fillColor": ratio_cmap(ratio),
+            "fillOpacity": 0.6,
+            "weight": 0.1,
+            "color": "black",
+        }
 
-    # Tooltip layer
     folium.GeoJson(
         gj,
-        name="ratio",
+        name="Soccer fields (count)",
+        style_function=ratio_style,
         tooltip=folium.features.GeoJsonTooltip(
             fields=["ratio"],
             aliases=[f"{'ratio'}: "],
             sticky=True,
         ),
-        style_function=lambda _: {"weight": 0},
     ).add_to(m)
 
+    ratio_cmap.add_to(m)
     folium.LayerControl(collapsed=False).add_to(m)
 
 
@@ -129,15 +128,16 @@ gdf["ratio"] = np.where(
 gdf["ratio"] /= gdf["ratio"].max()
 
 # Reproject to WGS84 for Folium
-gdf_wgs = gdf.to_crs(4326)
+gdf_wgs = reproject(gdf, 4326)
 
-# Map center
-minx, miny, maxx, maxy = gdf_wgs.total_bounds
+# Map center: bounds in the native CRS, only the 4 corners are reprojected
+bx0, by0, bx1, by1 = gdf.total_bounds
+lons, lats = get_transformer(gdf.crs, 4326).transform(
+    [bx0, bx1, bx0, bx1], [by0, by0, by1, by1]
+)
+minx, miny, maxx, maxy = min(lons), min(lats), max(lons), max(lats)
 center = [(miny + maxy) / 2.0, (minx + maxx) / 2.0]
 
-# GeoJSON for folium
-gj = json.loads(gdf_wgs.to_json())
-
 # Compute vmin/vmax based on quantiles (to reduce outlier distortion)
 valid = gdf_wgs["ratio"].replace([np.inf, -np.inf], np.nan).dropna()
 if valid.empty:
@@ -168,24 +168,26 @@ cmap.caption = "Soccer fields / Value (ratio)"
 
 # cmap.colors = list(reversed(cmap.colors))
 
+# GeoJSON for folium, with each tile's color precomputed from the colormap
+gdf_wgs["fillColor"] = colormap_lookup(gdf_wgs["ratio"], cmap)
+gj = gdf_wgs.to_geo_dict()
+
 # Initialize map
 m = folium.Map(location=center, zoom_start=11, tiles="cartodbpositron")
 
 
 # --- style tiles manually using the colormap ---
+# fillColor is None exactly where the ratio is missing, so no NaN check per feature
+GREY_STYLE = {"fillOpacity": 0.0, "weight": 0.1, "color": "grey"}
+COLOR_STYLE_BASE = {"color": "black", "weight": 0.1, "fillOpacity": 0.3}
+
+
 def style_fn(feature):
-    r = feature["properties"].get("ratio")
-    if r is None or np.isnan(r):
-        return {"fillOpacity": 0.0, "weight": 0.1, "color": "grey"}
-    return {
-        "fillColor": cmap(r),
-        "color": "black",
-        "weight": 0.1,
-        "fillOpacity": 0.3,
-    }
-
-
-def add_soccer_ratio_to_map(m):
+    color = feature["properties"]["fillColor"]
+    return GREY_STYLE if color is None else {**COLOR_STYLE_BASE, "fillColor": color}
+
+
+def add_soccer_ratio_to_map(m, gj):
     folium.GeoJson(
         gj,
         name="Soccer-to-Population Ratio (normalized)",
@@ -204,7 +206,7 @@ def add_soccer_ratio_to_map(m):
     return m
 
 
-m = add_soccer_ratio_to_map(m)
+m = add_soccer_ratio_to_map(m, gj)
 m = add_soccer_fields_to_map(m)
 # not really working yet
 # m = add_rooftops_to_map(m)
@@ -1,19 +1,24 @@
-import json
 import folium
 import geopandas as gpd
+import numpy as np
+import shapely
 from pathlib import Path
 
 
 def add_rooftops_overlay(
-    m, filename="../berlin_rooftops_compressed.geojson", assume_epsg=False
+    m,
+    filename="../berlin_rooftops_compressed.geojson",
+    assume_epsg=False,
+    simplify_m=1.0,
 ):
     """
     Overlay polygon GeoJSON in orange, reproject to WGS84, and fit the map.
     - filename: path relative to this script (same folder by default)
     - assume_epsg: if your file has no CRS, set e.g. 25833 (Berlin UTM) or 4326
+    - simplify_m: simplification tolerance in metres (None/0 keeps full detail)
     """
     path = Path(__file__).parent / filename
-    gdf = gpd.read_file(path)
+    gdf = gpd.read_file(path, engine="pyogrio", use_arrow=True)
 
     # If file has no CRS, optionally assume one (Berlin datasets often use EPSG:25833)
     if gdf.crs is None and assume_epsg:
@@ -23,18 +28,28 @@ def add_rooftops_overlay(
     if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
         gdf = gdf.to_crs(4326)
 
-    # Fix invalid geometries (common with complex footprints)
-    if not gdf.geometry.is_valid.all():
-        gdf = gdf.set_geometry(gdf.buffer(0))
+    # Fix invalid geometries (common with complex footprints); only the broken
+    # ones go through GEOS make_valid, valid footprints are left untouched
+    geoms = np.asarray(gdf.geometry)
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms = geoms.copy()
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+        gdf = gdf.set_geometry(geoms, crs=gdf.crs)
 
-    # Build GeoJSON for Folium
-    gj = json.loads(gdf.to_json())
+    # Display-only simplification in Web Mercator metres
+    if simplify_m and gdf.crs is not None:
+        gdf = gdf.to_crs(3857)
+        gdf = gdf.set_geometry(gdf.simplify(simplify_m, preserve_topology=True))
+        gdf = gdf.to_crs(4326)
 
     # Choose a few tooltip fields if present
     tooltip_fields = [c for c in gdf.columns if c != "geometry"][:4]
 
+    # folium converts the GeoDataFrame itself (to_crs(4326), then a json
+    # dumps/loads of __geo_interface__), so no to_geo_dict() is needed here
     layer = folium.GeoJson(
-        data=gj,
+        data=gdf,
         name="Rooftops",
         style_function=lambda f: {
             "fillColor": "#ff7f00",  # bright orange
@@ -1,5 +1,7 @@
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Overpass API endpoint
 overpass_url = "https://overpass-api.de/api/interpreter"
@@ -16,41 +18,48 @@ area["wikidata"="Q64"]->.searchArea;
 out tags center;
 """
 
-# Fetch data
-resp = requests.post(overpass_url, data={"data": query})
+# Fetch data over a pooled keep-alive session that retries transient errors
+session = requests.Session()
+session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 504],
+            allowed_methods=["POST"],
+        ),
+    ),
+)
+resp = session.post(overpass_url, data={"data": query}, timeout=180)
 resp.raise_for_status()
 elements = resp.json()["elements"]
 
+TAG_FIELDS = ["name", "cuisine", "addr:street", "addr:housenumber", "phone", "website"]
 
-# Normalize lat/lon and extract useful tags
-def get_latlon(el):
-    if el["type"] == "node":
-        return el["lat"], el["lon"]
-    c = el.get("center")
-    return (c["lat"], c["lon"]) if c else (None, None)
-
-
-rows = []
-for el in elements:
-    lat, lon = get_latlon(el)
-    tags = el.get("tags", {})
-    rows.append(
-        {
-            "osm_type": el["type"],
-            "osm_id": el["id"],
-            "name": tags.get("name"),
-            "cuisine": tags.get("cuisine"),
-            "addr:street": tags.get("addr:street"),
-            "addr:housenumber": tags.get("addr:housenumber"),
-            "phone": tags.get("phone"),
-            "website": tags.get("website"),
-            "lat": lat,
-            "lon": lon,
-        }
-    )
-
-# Convert to DataFrame
-df = pd.DataFrame(rows)
+# Flatten all elements at once; tags become "tags.<key>" columns and
+# ways/relations carry their position in "center.lat"/"center.lon"
+flat = pd.json_normalize(elements)
+
+
+def column(name):
+    if name in flat:
+        return flat[name]
+    return pd.Series(None, index=flat.index, dtype=object)
+
+
+is_node = column("type") == "node"
+df = pd.DataFrame(
+    {
+        "osm_type": column("type"),
+        "osm_id": column("id"),
+        **{tag: column(f"tags.{tag}") for tag in TAG_FIELDS},
+        "lat": column("lat").where(is_node, column("center.lat")),
+        "lon": column("lon").where(is_node, column("center.lon")),
+    }
+)
 
 # Save to CSV
 output_file = "berlin_restaurants.csv"
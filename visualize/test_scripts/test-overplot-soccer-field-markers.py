@@ -1,4 +1,5 @@
 import folium
+import geopandas as gpd
 import overpass
 import pandas as pd
 
@@ -6,16 +7,20 @@ import pandas as pd
 def main():
     restaurants = pd.read_csv("berlin_soccer_fields.csv")
     m = folium.Map(location=(52.4813076, 13.4381063), zoom_start=12)
-    for _, row in restaurants.iterrows():
-        name = row.get("name") or "Unnamed field"
-        leisure = row.get("leisure") or "unknown type"
-        popup_html = f"<b>{leisure}</b><br>{name}"
-        marker = folium.Marker(
-            location=[row["lat"], row["lon"]],
-            popup=folium.Popup(popup_html, max_width=250),
-            tooltip=leisure,
-        )
-        marker.add_to(m)
+    leisure = restaurants["leisure"].fillna("unknown type")
+    name = restaurants["name"].fillna("Unnamed field")
+    points = gpd.GeoDataFrame(
+        {"leisure": leisure, "popup": "<b>" + leisure + "</b><br>" + name},
+        geometry=gpd.points_from_xy(restaurants["lon"], restaurants["lat"]),
+        crs=4326,
+    )
+    # One GeoJson layer instead of one Marker object per row
+    folium.GeoJson(
+        points,
+        marker=folium.Marker(),
+        popup=folium.GeoJsonPopup(fields=["popup"], labels=False, max_width=250),
+        tooltip=folium.GeoJsonTooltip(fields=["leisure"], labels=False),
+    ).add_to(m)
     m.save("index.html")
 
 
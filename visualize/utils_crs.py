@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+
+
+@lru_cache(maxsize=None)
+def get_transformer(src_crs, dst_crs):
+    """Cached always_xy Transformer; building one goes through the PROJ database."""
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def reproject(gdf, dst_crs):
+    """
+    Drop-in for gdf.to_crs(dst_crs) that reuses a cached Transformer and sends
+    all vertices through a single transform call on flat coordinate arrays.
+    """
+    transformer = get_transformer(gdf.crs, dst_crs)
+    geoms = shapely.transform(
+        np.asarray(gdf.geometry),
+        lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])),
+    )
+    return gdf.set_geometry(geoms, crs=dst_crs)
@@ -1,12 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from shapely.geometry import box
+import pandas as pd
+import shapely
 import geopandas as gpd
 
+from utils_crs import reproject
+
 
 def pick_utm_epsg_from_wgs84_bounds(gdf_ll):
-    """Pick a UTM zone based on centroid in lon/lat; returns EPSG (WGS84 UTM)."""
-    c = gdf_ll.unary_union.centroid
-    lon, lat = c.x, c.y
+    """Pick a UTM zone from the lon/lat bounds midpoint; returns EPSG (WGS84 UTM)."""
+    # Bounds midpoint instead of the union centroid: no GEOS union just for a zone
+    minx, miny, maxx, maxy = gdf_ll.total_bounds
+    lon, lat = 0.5 * (minx + maxx), 0.5 * (miny + maxy)
     zone = int(np.floor((lon + 180) / 6) + 1)
     return 32600 + zone if lat >= 0 else 32700 + zone
 
@@ -21,59 +27,127 @@ def make_fishnet(bounds, tile_size):
     xs = np.arange(minx, maxx, tile_size)
     ys = np.arange(miny, maxy, tile_size)
 
-    boxes = []
-    ids = []
-    for i, x in enumerate(xs):
-        for j, y in enumerate(ys):
-            boxes.append(box(x, y, x + tile_size, y + tile_size))
-            ids.append(f"t_{i}_{j}")
-    return ids, boxes
-
-
-def regrid_sum_2km(gdf, tile_size_m=2000, area_weighted=True, target_epsg=None):
+    # All tiles in one vectorized shapely.box call (same x-major order as before)
+    X, Y = np.meshgrid(xs, ys, indexing="ij")
+    x0, y0 = X.ravel(), Y.ravel()
+    boxes = shapely.box(x0, y0, x0 + tile_size, y0 + tile_size)
+
+    I, J = np.meshgrid(np.arange(len(xs)), np.arange(len(ys)), indexing="ij")
+    ids = np.char.add(
+        np.char.add("t_", I.ravel().astype(str)),
+        np.char.add("_", J.ravel().astype(str)),
+    )
+    # Snapped origin and tile counts: enough to bucket points without a join
+    layout = (float(minx), float(miny), len(xs), len(ys))
+    return ids, boxes, layout
+
+
+def regrid_sum_2km(
+    gdf,
+    tile_size_m=2000,
+    area_weighted=True,
+    target_epsg=None,
+    workers=None,
+    return_crs=None,
+):
     if gdf.crs is None:
         raise ValueError("gdf.crs is None. Set a CRS (e.g. EPSG:4326) before calling.")
 
     # Project to meters
     if gdf.crs.is_geographic:
-        epsg = target_epsg or pick_utm_epsg_from_wgs84_bounds(gdf.to_crs(4326))
+        epsg = target_epsg
+        if not epsg:
+            # Only bounds are needed to pick the zone; WGS84 input is used as is
+            gdf_ll = gdf if gdf.crs.to_epsg() == 4326 else gdf.to_crs(4326)
+            epsg = pick_utm_epsg_from_wgs84_bounds(gdf_ll)
         gdfm = gdf.to_crs(epsg=epsg)
     else:
         gdfm = gdf
         epsg = gdfm.crs.to_epsg()
 
     # Build grid
-    ids, boxes = make_fishnet(gdfm.total_bounds, tile_size_m)
-    grid = gpd.GeoDataFrame({"tile_id": ids, "geometry": boxes}, crs=gdfm.crs)
+    ids, boxes, (grid_minx, grid_miny, nx, ny) = make_fishnet(
+        gdfm.total_bounds, tile_size_m
+    )
+    # Categorical tile ids: groupby/merge work on integer codes, not strings
+    grid = gpd.GeoDataFrame(
+        {"tile_id": pd.Categorical(ids), "geometry": boxes}, crs=gdfm.crs
+    )
+    # Fishnet layout in the metric CRS; survives reprojection so callers can
+    # bucket projected points into cells arithmetically (tile_id "t_<ix>_<iy>")
+    grid.attrs["fishnet"] = {
+        "crs": gdfm.crs.to_string(),
+        "minx": grid_minx,
+        "miny": grid_miny,
+        "tile_size": tile_size_m,
+        "nx": nx,
+        "ny": ny,
+    }
 
     if area_weighted:
-        # Pre-compute original polygon areas to get fractions
-        gdfm = gdfm.copy()
-        gdfm["poly_area"] = gdfm.geometry.area
-
-        # Intersection
-        inter = gpd.overlay(
-            gdfm[["value", "poly_area", "geometry"]],
-            grid[["tile_id", "geometry"]],
-            how="intersection",
-            keep_geom_type=False,
+        # STRtree prunes to candidate (polygon, tile) pairs
+        poly_geoms = np.asarray(gdfm.geometry)
+        tile_geoms = np.asarray(grid.geometry)
+        poly_idx, tile_idx = shapely.STRtree(tile_geoms).query(
+            poly_geoms, predicate="intersects"
         )
 
-        if inter.empty:
+        if len(poly_idx) == 0:
             # Return empty result with same grid CRS
             grid["sum_value"] = 0.0
             return grid
 
-        inter["inter_area"] = inter.geometry.area
+        poly_area = shapely.area(poly_geoms)[poly_idx]
+        inter_area = np.empty(len(poly_idx))
+
+        # MBR shortcut: a polygon whose bounding box lies inside its tile overlaps
+        # it with its full area, so only the remaining pairs need a GEOS call
+        pair_poly_bounds = shapely.bounds(poly_geoms)[poly_idx]
+        pair_tile_bounds = shapely.bounds(tile_geoms)[tile_idx]
+        inside = np.all(pair_poly_bounds[:, :2] >= pair_tile_bounds[:, :2], axis=1) & (
+            np.all(pair_poly_bounds[:, 2:] <= pair_tile_bounds[:, 2:], axis=1)
+        )
+        inter_area[inside] = poly_area[inside]
+
+        # Tiles are axis-aligned boxes, so use GEOS's rectangle clipping instead of
+        # a general intersection. clip_by_rect only takes scalar bounds, so the
+        # partial pairs are grouped by tile and clipped one vectorized call per tile.
+        partial = np.flatnonzero(~inside)
+        partial = partial[np.argsort(tile_idx[partial], kind="stable")]
+        partial_tiles = tile_idx[partial]
+        starts = np.flatnonzero(np.r_[True, partial_tiles[1:] != partial_tiles[:-1]])
+        stops = np.r_[starts[1:], len(partial)]
+        groups = (
+            [partial[start:stop] for start, stop in zip(starts, stops)]
+            if len(partial)
+            else []
+        )
+
+        # shapely releases the GIL inside GEOS, so the per-tile clips run on a
+        # thread pool; each tile writes a disjoint slice of inter_area
+        def clip_area(pairs):
+            return shapely.area(
+                shapely.clip_by_rect(
+                    poly_geoms[poly_idx[pairs]], *pair_tile_bounds[pairs[0]]
+                )
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for pairs, area in zip(groups, executor.map(clip_area, groups)):
+                inter_area[pairs] = area
+
         # Avoid division by zero (degenerate geometries)
-        inter = inter[inter["poly_area"] > 0]
-        inter["weighted_value"] = inter["value"] * (
-            inter["inter_area"] / inter["poly_area"]
+        weighted_value = np.divide(
+            gdfm["value"].to_numpy(dtype=float)[poly_idx] * inter_area,
+            poly_area,
+            out=np.zeros_like(inter_area),
+            where=poly_area > 0,
         )
 
         # Sum by tile
-        out = inter.groupby("tile_id", as_index=False)["weighted_value"].sum()
-        out = out.rename(columns={"weighted_value": "sum_value"})
+        grid["sum_value"] = np.bincount(
+            tile_idx, weights=weighted_value, minlength=len(grid)
+        )
     else:
         # Simple overlap: count each polygon's full value if it touches a tile
         # Quicker route: spatial join then groupby
@@ -86,15 +160,18 @@ def regrid_sum_2km(gdf, tile_size_m=2000, area_weighted=True, target_epsg=None):
         if joined.empty:
             grid["sum_value"] = 0.0
             return grid
-        out = joined.groupby("tile_id", as_index=False)["value"].sum()
-        out = out.rename(columns={"value": "sum_value"})
+        # Sum by tile: index_right is the grid row, so a dense bincount replaces
+        # the groupby over tile ids and the merge back onto the grid
+        grid["sum_value"] = np.bincount(
+            joined["index_right"].to_numpy(),
+            weights=joined["value"].to_numpy(dtype=float),
+            minlength=len(grid),
+        )
 
-    # Attach sums back to grid GeoDataFrame
-    grid = grid.merge(out, on="tile_id", how="left")
     grid["value"] = grid["sum_value"].fillna(0.0)
 
-    # (Optional) return to original CRS
-    try:
-        return grid.to_crs(gdf.crs)
-    except Exception:
+    # Stay in the metric CRS unless the caller asks for another one (e.g. 4326
+    # for Folium), so the grid goes through PROJ at most once
+    if return_crs is None or grid.crs.equals(return_crs):
         return grid
+    return reproject(grid, return_crs)
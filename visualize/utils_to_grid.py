@@ -1,5 +1,11 @@
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
+
+from utils_crs import get_transformer
 
 
 def add_soccer_counts_to_grid(
@@ -14,12 +20,22 @@ def add_soccer_counts_to_grid(
     if grid.crs is None:
         raise ValueError("Grid GeoDataFrame has no CRS. Set one (e.g., EPSG:4326).")
 
-    # Load CSV -> points GeoDataFrame
-    df = pd.read_csv(csv_path)
+    # Load CSV -> points GeoDataFrame; Arrow-backed strings keep the text
+    # columns in contiguous buffers, so contains/dedupe run in Arrow kernels.
+    # A Parquet copy next to the CSV is reused until the CSV changes.
+    csv_path = Path(csv_path)
+    cache = csv_path.with_suffix(".parquet")
+    if cache.exists() and cache.stat().st_mtime >= csv_path.stat().st_mtime:
+        df = pd.read_parquet(cache, dtype_backend="pyarrow")
+    else:
+        df = pd.read_csv(csv_path, engine="pyarrow", dtype_backend="pyarrow")
+        df.to_parquet(cache, index=False)
 
     # Optional filtering to soccer-only rows
     if filter_soccer and "sport" in df.columns:
-        df = df[df["sport"].astype(str).str.contains("soccer", case=False, na=False)]
+        sport = df["sport"].astype("string[pyarrow]")
+        # Literal match: Arrow's substring kernel instead of the regex engine
+        df = df[sport.str.contains("soccer", case=False, regex=False, na=False)]
 
     # Optional dedupe by unique OSM feature
     if dedupe and {"osm_type", "osm_id"}.issubset(df.columns):
@@ -28,11 +44,8 @@ def add_soccer_counts_to_grid(
     # Build points
     if lon_col not in df.columns or lat_col not in df.columns:
         raise KeyError(f"CSV must contain '{lon_col}' and '{lat_col}' columns.")
-    pts = gpd.GeoDataFrame(
-        df,
-        geometry=gpd.points_from_xy(df[lon_col], df[lat_col]),
-        crs=4326,
-    ).to_crs(grid.crs)
+    lon = df[lon_col].to_numpy(dtype=float)
+    lat = df[lat_col].to_numpy(dtype=float)
 
     # Ensure the grid has a stable ID
     grid = grid.copy()
@@ -40,19 +53,39 @@ def add_soccer_counts_to_grid(
         grid = grid.reset_index(drop=True)
         grid[tile_id_col] = grid.index.astype(int)
 
-    # Spatial join: count points per tile
+    # Fishnet from regrid_sum_2km: the cell of a point is plain floor division of
+    # its projected coordinates, counted with one bincount (no spatial join).
+    # Counts go back through each row's "t_<ix>_<iy>" id, never its position, so
+    # sorted or subset grids stay correct.
+    fishnet = grid.attrs.get("fishnet")
+    cells = None
+    if fishnet is not None:
+        cells = grid[tile_id_col].astype(str).str.extract(r"^t_(\d+)_(\d+)$")
+    if cells is not None and cells.notna().all(axis=None):
+        nx, ny = fishnet["nx"], fishnet["ny"]
+        xs, ys = get_transformer(4326, fishnet["crs"]).transform(lon, lat)
+        ix = np.floor((xs - fishnet["minx"]) / fishnet["tile_size"])
+        iy = np.floor((ys - fishnet["miny"]) / fishnet["tile_size"])
+        inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+        codes = ix[inside].astype(np.int64) * ny + iy[inside].astype(np.int64)
+        counts = np.bincount(codes, minlength=nx * ny)
+        cell_codes = cells[0].astype(np.int64) * ny + cells[1].astype(np.int64)
+        grid["soccer_count"] = counts[cell_codes.to_numpy()]
+        return grid
+
+    # Project the raw coordinates, then construct all points in one call
+    xs, ys = get_transformer(4326, grid.crs).transform(lon, lat)
+    pts = gpd.GeoDataFrame(geometry=shapely.points(xs, ys), crs=grid.crs)
+
+    # Spatial join: count points per tile. The counts are written straight into
+    # the grid by row position, no groupby on tile ids and no merge that copies
+    # every column (geometry included)
     joined = gpd.sjoin(
         pts[["geometry"]],
-        grid[[tile_id_col, "geometry"]],
-        how="left",
+        grid[["geometry"]],
+        how="inner",
         predicate="within",
     )
-    counts = (
-        joined.groupby(tile_id_col, as_index=False)
-        .size()
-        .rename(columns={"size": "soccer_count"})
-    )
-
-    # Merge counts onto grid
-    out = grid.merge(counts, on=tile_id_col, how="left")
-    return out
+    rows = grid.index.get_indexer(joined["index_right"])
+    grid["soccer_count"] = np.bincount(rows, minlength=len(grid))
+    return grid
@@ -1,8 +1,12 @@
 import folium
+from functools import lru_cache
 from pathlib import Path
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-import json
+import shapely
+
+from utils_crs import reproject
 
 
 LEISURE_TO_COLOR = {
@@ -12,35 +16,82 @@ LEISURE_TO_COLOR = {
 }
 
 
-def add_rooftops_to_map(m, filename="berlin_rooftops.geojson", assume_epsg=None):
+def colormap_lookup(values, cmap, n=256):
     """
-    Overlay polygon GeoJSON in orange, reproject to WGS84, and fit the map.
-    - filename: path relative to this script (same folder by default)
-    - assume_epsg: if your file has no CRS, set e.g. 25833 (Berlin UTM) or 4326
+    Map values to hex colors through an n-entry lookup table of a branca colormap,
+    instead of calling cmap(value) once per feature. Non-finite values map to None.
     """
-    path = Path(__file__).parent / filename
-    gdf = gpd.read_file(path)
+    values = np.asarray(values, dtype=float)
+    bins = np.linspace(cmap.vmin, cmap.vmax, n)
+    palette = np.array([cmap(v) for v in bins], dtype=object)
+    colors = palette[np.clip(np.digitize(values, bins) - 1, 0, n - 1)]
+    colors[~np.isfinite(values)] = None
+    return colors
+
 
-    # If file has no CRS, optionally assume one (Berlin datasets often use EPSG:25833)
-    if gdf.crs is None and assume_epsg:
-        gdf = gdf.set_crs(assume_epsg, allow_override=True)
+@lru_cache(maxsize=4)
+def load_rooftops(path, assume_epsg=None, simplify_m=1.0):
+    """Read, reproject to WGS84 and repair a rooftop layer; cached per path."""
+    # The cleaned layer is kept as GeoParquet next to the source and reused
+    # until the source changes; parsing the GeoJSON dominates cold starts.
+    # assume_epsg changes the result for CRS-less sources, so it is part of the name
+    path = Path(path)
+    suffix = f".epsg{assume_epsg}.parquet" if assume_epsg else ".parquet"
+    cache = path.with_suffix(suffix)
+    if cache.exists() and cache.stat().st_mtime >= path.stat().st_mtime:
+        gdf = gpd.read_parquet(cache)
+    else:
+        gdf = gpd.read_file(path, engine="pyogrio", use_arrow=True)
 
-    # Reproject to WGS84 for Folium
-    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
-        gdf = gdf.to_crs(4326)
+        # If file has no CRS, optionally assume one (Berlin data often uses EPSG:25833)
+        if gdf.crs is None and assume_epsg:
+            gdf = gdf.set_crs(assume_epsg, allow_override=True)
 
-    # Fix invalid geometries (common with complex footprints)
-    if not gdf.geometry.is_valid.all():
-        gdf = gdf.set_geometry(gdf.buffer(0))
+        # Reproject to WGS84 for Folium
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(4326)
 
-    # Build GeoJSON for Folium
-    gj = json.loads(gdf.to_json())
+        # Fix invalid geometries (common with complex footprints); only the broken
+        # ones go through GEOS make_valid, valid footprints are left untouched
+        geoms = np.asarray(gdf.geometry)
+        invalid = ~shapely.is_valid(geoms)
+        if invalid.any():
+            geoms = geoms.copy()
+            geoms[invalid] = shapely.make_valid(geoms[invalid])
+            gdf = gdf.set_geometry(geoms, crs=gdf.crs)
+
+        gdf.to_parquet(cache)
+
+    # Display-only Douglas-Peucker in Web Mercator metres: sub-pixel vertices
+    # are dropped before the polygons are serialized for Leaflet
+    if simplify_m and gdf.crs is not None:
+        gdf_m = reproject(gdf, 3857)
+        geoms = shapely.simplify(
+            np.asarray(gdf_m.geometry), simplify_m, preserve_topology=True
+        )
+        gdf = reproject(gdf_m.set_geometry(geoms, crs=3857), 4326)
+
+    return gdf
+
+
+def add_rooftops_to_map(
+    m, filename="berlin_rooftops.geojson", assume_epsg=None, simplify_m=1.0
+):
+    """
+    Overlay polygon GeoJSON in orange, reproject to WGS84, and fit the map.
+    - filename: path relative to this script (same folder by default)
+    - assume_epsg: if your file has no CRS, set e.g. 25833 (Berlin UTM) or 4326
+    - simplify_m: simplification tolerance in metres (None/0 keeps full detail)
+    """
+    gdf = load_rooftops(Path(__file__).parent / filename, assume_epsg, simplify_m)
 
     # Choose a few tooltip fields if present
     tooltip_fields = [c for c in gdf.columns if c != "geometry"][:4]
 
+    # folium converts the GeoDataFrame itself (to_crs(4326), then a json
+    # dumps/loads of __geo_interface__), so no to_geo_dict() is needed here
     layer = folium.GeoJson(
-        data=gj,
+        data=gdf,
         name="Rooftops",
         style_function=lambda f: {
             "fillColor": "#ff7f00",  # bright orange
@@ -70,38 +121,41 @@ def add_rooftops_to_map(m, filename="berlin_rooftops.geojson", assume_epsg=None)
 
 
 def add_soccer_fields_to_map(m):
-    soccer_fields = pd.read_csv("berlin_soccer_fields.csv")
-    for _, row in soccer_fields.iterrows():
-        # name = row.get("name")
-        # if pd.isna(name) or name == "nan":
-        #     name = "Unnamed field"
-        leisure = row.get("leisure")
-        if pd.isna(leisure) or leisure == "nan":
-            leisure = "unknown type"
-        color = LEISURE_TO_COLOR.get(leisure, "grey")
-        image_path = f"facility_images_brighter/{row['osm_id']}.png"
-        #     {name}<br><br>
-        html = f"""
-            <div style="width:125px; font-size:14px; line-height:1.3">
-            <b>{leisure}</b><br>
-            <img src="{image_path}" alt="image" style="width:100%; height:auto; border-radius:4px;">
-            </div>
-        """
-        # marker = folium.Marker(
-        #     location=[row["lat"], row["lon"]],
-        #     popup=folium.Popup(popup_html, max_width=250),
-        #     tooltip=leisure,
-        # )
-        # marker.add_to(m)
-
-        folium.CircleMarker(
-            location=[row.lat, row.lon],
+    # Only the columns the layer uses; everything below is column-wise, no row loop
+    soccer_fields = pd.read_csv(
+        "berlin_soccer_fields.csv", usecols=["leisure", "osm_id", "lon", "lat"]
+    )
+    leisure = (
+        soccer_fields["leisure"].fillna("unknown type").replace("nan", "unknown type")
+    )
+    popup_html = (
+        '<div style="width:125px; font-size:14px; line-height:1.3"><b>'
+        + leisure
+        + '</b><br><img src="facility_images_brighter/'
+        + soccer_fields["osm_id"].astype(str)
+        + '.png" alt="image" style="width:100%; height:auto; border-radius:4px;"></div>'
+    )
+    points = gpd.GeoDataFrame(
+        {
+            "color": leisure.map(LEISURE_TO_COLOR).fillna("grey"),
+            "popup": popup_html,
+        },
+        geometry=gpd.points_from_xy(soccer_fields["lon"], soccer_fields["lat"]),
+        crs=4326,
+    )
+
+    # One GeoJson layer for all fields instead of one CircleMarker object per row
+    folium.GeoJson(
+        points,
+        name="Soccer fields",
+        marker=folium.CircleMarker(
             radius=4,  # ← smaller size (default is ~10)
             color="black",
             weight=0.5,
             fill=True,
-            fill_color=color,
             fill_opacity=0.8,
-            popup=folium.Popup(html, max_width=125),
-        ).add_to(m)
+        ),
+        style_function=lambda f: {"fillColor": f["properties"]["color"]},
+        popup=folium.GeoJsonPopup(fields=["popup"], labels=False, max_width=125),
+    ).add_to(m)
     return m